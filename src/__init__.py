@@ -13,6 +13,11 @@ DOWNLOADS_DIR.mkdir(exist_ok=True)
 TMP_DIR = PARENT_DIR / 'tmp'
 rmtree(TMP_DIR, ignore_errors=True)
 TMP_DIR.mkdir()
+# RAM backed work directory for media files, only used when /dev/shm is available
+SHM_DIR = Path('/dev/shm') / 'telegram-utils-bot'  # noqa: S108
+rmtree(SHM_DIR, ignore_errors=True)
+if SHM_DIR.parent.is_dir():
+    SHM_DIR.mkdir()
 
 # bot config
 IS_DEBUG: bool = getenv('DEBUG', '').lower() in ('true', '1')
@@ -17,6 +17,7 @@ from telethon.events import CallbackQuery, InlineQuery, NewMessage, StopPropagat
 
 from src import API_HASH, API_ID, BOT_ADMINS, BOT_TOKEN, PARENT_DIR
 from src.modules.base import InlineModuleBase, ModuleBase
+from src.utils.http import close_session
 from src.utils.i18n import t
 from src.utils.modules_registry import ModuleRegistry
 from src.utils.permission_manager import PermissionManager
@@ -24,6 +25,7 @@ from src.utils.telegram import get_reply_message
 
 bot = TelegramClient('utils-bot', API_ID, API_HASH).start(bot_token=BOT_TOKEN)
 bot.parse_mode = 'html'
+bot.active_tasks = {}
 bot_info = {}
 permission_manager = PermissionManager(set(BOT_ADMINS), PARENT_DIR / 'permissions.json')
 modules_registry = ModuleRegistry(__package__, permission_manager)
@@ -74,8 +76,6 @@ async def handle_module_execution(
     task_id = f'{message.chat_id}_{message.id}'
     task: Task[bool] = create_task(module.handle(*handler_args))
 
-    if not hasattr(event.client, 'active_tasks'):
-        event.client.active_tasks = {}
     event.client.active_tasks[task_id] = task
 
     try:
@@ -169,7 +169,7 @@ async def start_command(event: NewMessage.Event) -> None:
 async def cancel_command(event: NewMessage.Event) -> None:
     original_message = await get_reply_message(event)
     task_id = f'{original_message.chat_id}_{original_message.id}'
-    if not getattr(event.client, 'active_tasks', {}).get(task_id):
+    if not event.client.active_tasks.get(task_id):
         await event.reply(t('no_active_operation'))
         return
     event.client.active_tasks[task_id].cancel()
@@ -218,3 +218,4 @@ async def run_bot() -> None:
     # Run blocking
     async with bot:
         await bot.run_until_disconnected()
+    await close_session()
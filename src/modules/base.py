@@ -1,48 +1,65 @@
 from abc import ABC, abstractmethod
-from collections.abc import Awaitable, Callable, Coroutine
+from collections.abc import Awaitable, Callable, Coroutine, Mapping
+from types import MappingProxyType
 from typing import Any, ClassVar
 
-import regex as re
 from telethon import TelegramClient
 from telethon.events import CallbackQuery, InlineQuery, NewMessage
 from telethon.tl.custom import Message
 
 from src.utils.command import Command, InlineCommand
 from src.utils.i18n import t
-from src.utils.patterns import HTTP_URL_PATTERN
+from src.utils.patterns import HTTP_URL_REGEX
 from src.utils.telegram import get_reply_message
 
-CommandHandlerDict = dict[str, Callable[[NewMessage.Event | CallbackQuery.Event], Awaitable[None]]]
+CommandHandlerDict = Mapping[
+    str, Callable[[NewMessage.Event | CallbackQuery.Event], Awaitable[None]]
+]
+CallbackHandlerDict = Mapping[
+    bytes, Callable[[NewMessage.Event | CallbackQuery.Event], Awaitable[None]]
+]
+PatternHandlerDict = Mapping[
+    tuple[str, ...], Callable[[NewMessage.Event | CallbackQuery.Event], Awaitable[None]]
+]
 
 
 def matches_command(
-    event: NewMessage.Event, reply_message: Message | None, command: Command
+    event: NewMessage.Event, reply_message: Message | None, command: Command, text: str | None
 ) -> bool:
+    """Check the command's condition, and its pattern against `text` unless it is None."""
     if not command.condition(event, reply_message):
         return False
+    return text is None or bool(command.pattern.match(text))
 
-    text = event.message.raw_text
-    has_file = bool(event.message.file)
-    is_url_message = bool(re.search(HTTP_URL_PATTERN, text))
 
-    if text and not has_file and not is_url_message:
-        return bool(command.pattern.match(text))
-    return bool(is_url_message or has_file)
+def get_pattern_handlers(handlers: CommandHandlerDict) -> PatternHandlerDict:
+    """Key handlers by their command words, e.g. ('audio', 'compress') for 'audio compress'."""
+    return MappingProxyType(
+        {tuple(command.split(' ')): handler for command, handler in handlers.items()}
+    )
+
+
+def get_callback_handlers(handlers: CommandHandlerDict) -> CallbackHandlerDict:
+    """Key handlers by their callback data command, e.g. b'audio_compress' for 'audio compress'."""
+    return MappingProxyType(
+        {command.replace(' ', '_').encode(): handler for command, handler in handlers.items()}
+    )
 
 
 async def dynamic_handler(
-    handlers: CommandHandlerDict, event: NewMessage.Event | CallbackQuery.Event
+    pattern_handlers: PatternHandlerDict,
+    callback_handlers: CallbackHandlerDict,
+    event: NewMessage.Event | CallbackQuery.Event,
 ) -> None:
     if isinstance(event, CallbackQuery.Event):
-        command = event.data.decode('utf-8')
-        if command.startswith('m|'):
-            command = command[2:]
-        command = command.replace('_', ' ')
-        if '|' in command:
-            command, _ = command.split('|', 1)
+        command = event.data.removeprefix(b'm|').partition(b'|')[0]
+        handler = callback_handlers.get(command) or callback_handlers.get(
+            command.partition(b'_')[0]
+        )
     else:
-        command = ' '.join(' '.join(i for i in event.pattern_match.groups() if i).split(' ')[:2])
-    handler = handlers.get(command) or handlers.get(command.split(' ', 1)[0])
+        # the first two groups of command patterns are the command and its subcommand
+        words = tuple(filter(None, event.pattern_match.groups()[:2]))
+        handler = pattern_handlers.get(words) or pattern_handlers.get(words[:1])
     if not handler:
         await event.reply(t('command_not_found'))
         return
@@ -53,7 +70,7 @@ async def dynamic_handler(
 class ModuleBase(ABC):
     IS_MODULE = True
     CommandHandlerT = Callable[[NewMessage.Event], Coroutine[Any, Any, None]]
-    CommandsT = dict[str, Command]
+    CommandsT = Mapping[str, Command]
 
     @property
     @abstractmethod
@@ -71,11 +88,19 @@ class ModuleBase(ABC):
         pass
 
     async def is_applicable(self, event: NewMessage.Event) -> bool:
+        text = event.message.raw_text
+        # Files and URLs are offered every command whose condition passes, plain text only the
+        # commands it matches. This doesn't depend on the command, so check it once.
+        has_file_or_url = bool(event.message.file or HTTP_URL_REGEX.search(text))
+        if not text and not has_file_or_url:
+            return False
         reply_message = (
             await get_reply_message(event, previous=True) if event.message.is_reply else None
         )
+        pattern_text = None if has_file_or_url else text
         return any(
-            matches_command(event, reply_message, command) for command in self.commands.values()
+            matches_command(event, reply_message, command, pattern_text)
+            for command in self.commands.values()
         )
 
     @staticmethod
@@ -104,12 +129,29 @@ class InlineModuleBase(ModuleBase):
     def inline_commands(self) -> InlineCommandsT:
         pass
 
+    def get_inline_command(self, text: str) -> InlineCommand | None:
+        # Inline commands are keyed by their first word, so look that up before trying every
+        # pattern. Only queries that don't start with a known key (aliases) fall back to a scan.
+        key, _, arguments = text.partition(' ')
+        if command := self.inline_commands.get(key):
+            if command.pattern is None:
+                return command if arguments.strip() else None
+            return command if command.pattern.match(text) else None
+        return next(
+            (
+                command
+                for command in self.inline_commands.values()
+                if command.pattern and command.pattern.match(text)
+            ),
+            None,
+        )
+
     async def is_applicable(self, event: InlineQuery.Event) -> bool:
-        return any(command.pattern.match(event.text) for command in self.inline_commands.values())
+        return self.get_inline_command(event.text) is not None
 
     async def handle(self, event: InlineQuery.Event, _: str | None = None) -> bool:
-        for command in self.inline_commands.values():
-            if command.pattern.match(event.text) and callable(command.handler):
-                await command.handler(event)
-                return True
+        command = self.get_inline_command(event.text)
+        if command and callable(command.handler):
+            await command.handler(event)
+            return True
         return False
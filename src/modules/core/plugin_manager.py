@@ -3,7 +3,7 @@ from typing import ClassVar
 import regex as re
 from telethon.events import NewMessage
 from telethon.tl.functions.bots import SetBotCommandsRequest
-from telethon.tl.types import BotCommand, BotCommandScopePeer
+from telethon.tl.types import BotCommandScopePeer
 
 from src import bot
 from src.modules.base import ModuleBase
@@ -45,18 +45,13 @@ async def list_commands(event: NewMessage.Event) -> None:
         SetBotCommandsRequest(
             scope=BotCommandScopePeer(event.input_chat),
             lang_code='',
-            commands=[
-                BotCommand(command_name, command_data.description)
-                for module_commands in all_commands.values()
-                for command_name, command_data in module_commands.items()
-                if ' ' not in command_name
-            ],
+            commands=bot.modules_registry.get_bot_commands(all_commands),
         )
     )
 
 
 async def manage_plugins(event: NewMessage.Event) -> None:
-    action, module_name = event.message.text.split('plugins ')[1].split(' ')
+    action, _, module_name = event.message.text.partition('plugins ')[2].partition(' ')
     if action == 'enable':
         bot.modules_registry.enable_module(module_name)
         await event.reply(t('module_enabled', module_name=module_name))
@@ -98,5 +93,5 @@ class PluginManager(ModuleBase):
 
 bot.bot.add_event_handler(
     list_commands,
-    NewMessage(func=lambda x: x.message.text in ('/commands', '/help')),
+    NewMessage(pattern=re.compile(r'^/(commands|help)$')),
 )
@@ -15,7 +15,7 @@ from src.utils.telegram import get_reply_message
 
 
 async def list_tasks(event: NewMessage.Event) -> None:
-    active_tasks: dict[str, Task] = getattr(event.client, 'active_tasks', {})
+    active_tasks: dict[str, Task] = event.client.active_tasks
     if not active_tasks:
         await event.reply(t('no_active_tasks'))
         return
@@ -73,8 +73,8 @@ async def cancel_task(event: NewMessage.Event) -> None:
     """Cancel a specific task."""
     message = await get_reply_message(event) or event.message
     current_task_id = f'{message.chat_id}_{message.id}'
-    task_id = event.message.text.split('cancel ')[1]
-    active_tasks = getattr(event.client, 'active_tasks', {})
+    task_id = event.message.text.partition('cancel ')[2]
+    active_tasks = event.client.active_tasks
 
     if task_id == 'all':
         for task_id in list(active_tasks.keys()):
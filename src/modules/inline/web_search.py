@@ -1,34 +1,50 @@
+import asyncio
 import logging
+import re
 from contextlib import suppress
+from functools import cache
 from os import getenv
-from typing import ClassVar
+from typing import TYPE_CHECKING, ClassVar
 from urllib import parse
 
-import regex as re
-import wikipedia
-from search_engine_parser.core.base import SearchResult
-from search_engine_parser.core.engines.duckduckgo import Search as DuckDuckGoSearch
 from telethon import Button, events
 from telethon.errors import QueryIdInvalidError
 
 from src.modules.base import InlineModuleBase
 from src.utils.command import InlineCommand
-from src.utils.http import fetch_json
-from src.utils.i18n import t
+from src.utils.http import cached_fetch_json
+from src.utils.i18n import LazyStr, t
 from src.utils.quran import surah_names
 
-ddg_search = DuckDuckGoSearch()
+if TYPE_CHECKING:
+    from search_engine_parser.core.base import SearchResult
+    from search_engine_parser.core.engines.duckduckgo import Search as DuckDuckGoSearch
 
 
-async def list_all_inline_commands(event: events.InlineQuery.Event) -> None:
-    buttons = []
-    for cmd, command_obj in list(WebSearch.inline_commands.items())[1:]:  # Skip the first item
-        button_text = f'{cmd}: {command_obj.name}'
-        switch_inline_query = f'{cmd} '
-        buttons.append(Button.switch_inline(button_text, switch_inline_query, same_peer=True))
+@cache
+def get_ddg_search() -> 'DuckDuckGoSearch':
+    # search_engine_parser pulls in bs4 and lxml, only load it once ddg is actually used
+    from search_engine_parser.core.engines.duckduckgo import (  # noqa: PLC0415
+        Search as DuckDuckGoSearch,
+    )
+
+    return DuckDuckGoSearch()
+
 
+SURAH_TITLES = tuple(f'سورة {name}' for name in surah_names)
+EXCHANGE_API_URL = 'https://v6.exchangerate-api.com/v6/{}/pair/{}/{}/{}'
+
+
+async def list_all_inline_commands(event: events.InlineQuery.Event) -> None:
+    commands = list(WebSearch.inline_commands.items())[1:]  # Skip the first item
     # Create a grid of buttons, 2 buttons per row
-    button_grid = [buttons[i : i + 2] for i in range(0, len(buttons), 2)]
+    button_grid = [
+        [
+            Button.switch_inline(f'{cmd}: {command_obj.name}', f'{cmd} ', same_peer=True)
+            for cmd, command_obj in commands[i : i + 2]
+        ]
+        for i in range(0, len(commands), 2)
+    ]
 
     result = await event.builder.article(
         title=t('available_inline_commands'),
@@ -42,17 +58,17 @@ async def list_all_inline_commands(event: events.InlineQuery.Event) -> None:
 
 
 async def handle_duckduckgo_search(event: events.InlineQuery.Event) -> None:
-    query = event.text[4:].strip()
+    query = event.text.partition(' ')[2].strip()
     if not query:
         return
 
     try:
-        results: SearchResult = await ddg_search.async_search(query, 1)
+        results: SearchResult = await get_ddg_search().async_search(query, 1)
     except Exception as e:  # noqa: BLE001
         logging.error(f'{t('error_in_duckduckgo_search')}: {e}')
         return
 
-    inline_results = []
+    articles = []
     for result in results:
         title = result.get('titles', 'No title')
         link = result.get('links', '')
@@ -64,39 +80,50 @@ async def handle_duckduckgo_search(event: events.InlineQuery.Event) -> None:
             link = f'https://{link}'
         description = result.get('descriptions', 'No description')
 
-        inline_results.append(
-            await event.builder.article(
+        articles.append(
+            event.builder.article(
                 title=title,
                 description=description,
                 text=f'<b>{title}</b>\n\n{description}\n\n{link}',
             )
         )
 
+    inline_results = await asyncio.gather(*articles)
     with suppress(QueryIdInvalidError):
         await event.answer(inline_results)
 
 
 async def handle_wikipedia_search(event: events.InlineQuery.Event) -> None:
-    lang, query = event.text[5:].strip().split(maxsplit=1)
-
-    wikipedia.set_lang(lang)
-    try:
-        pages = wikipedia.search(query, 5)
-    except Exception as e:  # noqa: BLE001
-        logging.error(f'{t('error_in_wikipedia_search')}: {e}')
-        return
-    if not pages:
+    _, lang, query = event.text.split(maxsplit=2)
+
+    # a single request returns the search results together with their intro extracts
+    data = await cached_fetch_json(
+        f'https://{lang}.wikipedia.org/w/api.php',
+        params={
+            'action': 'query',
+            'format': 'json',
+            'formatversion': 2,
+            'generator': 'search',
+            'gsrsearch': query,
+            'gsrlimit': 5,
+            'prop': 'extracts',
+            'exintro': 1,
+            'explaintext': 1,
+            'exsentences': 3,
+            'exlimit': 5,
+        },
+        ttl=5 * 60,
+    )
+    if not data or 'query' not in data:
         return
 
-    inline_results = []
-    for title in pages:
-        try:
-            summary = wikipedia.summary(title, sentences=3)
-        except wikipedia.exceptions.PageError:
-            continue
+    articles = []
+    for page in sorted(data['query']['pages'], key=lambda page: page['index']):
+        title = page['title']
+        summary = page.get('extract', '')
         url = f'https://{lang}.wikipedia.org/wiki/{parse.quote(title)}'
-        inline_results.append(
-            await event.builder.article(
+        articles.append(
+            event.builder.article(
                 title=title,
                 description=summary,
                 text=f'<b>{title}</b>\n\n{summary}\n\n{url}',
@@ -104,30 +131,34 @@ async def handle_wikipedia_search(event: events.InlineQuery.Event) -> None:
             )
         )
 
+    inline_results = await asyncio.gather(*articles)
     with suppress(QueryIdInvalidError):
         await event.answer(inline_results)
 
 
 async def handle_quran_search(event: events.InlineQuery.Event) -> None:
-    query = event.text[6:].strip()  # Remove 'quran ' from the beginning
-    data = await fetch_json('https://api.quran.com/api/v4/search', params={'q': query})
+    query = event.text.partition(' ')[2].strip()
+    data = await cached_fetch_json(
+        'https://api.quran.com/api/v4/search', params={'q': query}, ttl=24 * 60 * 60
+    )
     if not data:
         return
 
     results = data['search']['results']
-    inline_results = []
+    articles = []
     for result in results:
         surah, aya = map(int, result['verse_key'].split(':'))
-        title = f'سورة {surah_names[surah - 1]} ({aya})'
+        title = f'{SURAH_TITLES[surah - 1]} ({aya})'
         text = result['text']
-        inline_results.append(
-            await event.builder.article(
+        articles.append(
+            event.builder.article(
                 title=title,
                 description=text,
                 text=f'<b>{title}</b>\n\n﴿{text}﴾',
             )
         )
 
+    inline_results = await asyncio.gather(*articles)
     with suppress(QueryIdInvalidError):
         await event.answer(inline_results)
 
@@ -136,17 +167,17 @@ async def handle_hadith_search(event: events.InlineQuery.Event) -> None:
     endpoint = getenv('HADITH_SEARCH_ENDPOINT')
     if not endpoint:
         return
-    query = event.text[7:].strip()  # Remove 'hadith ' from the beginning
+    query = event.text.partition(' ')[2].strip()
     if not query:
         return
-    data = await fetch_json(endpoint.format(query=query))
+    data = await cached_fetch_json(endpoint.format(query=query), ttl=5 * 60)
     if not data:
         return
     results = data.get('data', [])
     if not results:
         return
 
-    inline_results = []
+    articles = []
     for result in results:
         text = result.get('text', '')
         rawy = result.get('rawy', '')
@@ -156,18 +187,20 @@ async def handle_hadith_search(event: events.InlineQuery.Event) -> None:
         hukm = result.get('hukm', '')
 
         title = f'{muhaddith} - {source} ({source_location})'
-        description = f'{hukm} | {rawy}'
-        content = f'<b>{title}</b>\n<i>{description}</i>\n\n{text}'
+        content = f'<b>{title}</b>\n<i>{hukm} | {rawy}</i>\n\n{text}'
+        if len(content) > 4093:
+            content = f'{content[:4093]}…'
 
-        inline_results.append(
-            await event.builder.article(
+        articles.append(
+            event.builder.article(
                 title=title,
-                description=f'{description} | {text[:100]}',
-                text=content[:4093] + '…',
+                description=f'{hukm} | {rawy} | {text[:100]}',
+                text=content,
                 parse_mode='html',
             )
         )
 
+    inline_results = await asyncio.gather(*articles)
     with suppress(QueryIdInvalidError):
         await event.answer(inline_results)
 
@@ -177,18 +210,18 @@ async def handle_exchange(event: events.InlineQuery.Event) -> None:
     if not api_key:
         return
 
-    query = event.text[9:].strip()  # Remove 'exchange ' from the beginning
+    query = event.text.partition(' ')[2].strip()
     try:
         amount, from_currency, to_currency = query.split()
         amount = float(amount)
     except ValueError:
         return
 
-    url = (
-        f'https://v6.exchangerate-api.com/v6/{api_key}/pair/{from_currency}/{to_currency}/{amount}'
+    url = EXCHANGE_API_URL.format(
+        api_key, parse.quote(from_currency), parse.quote(to_currency), amount
     )
 
-    data = await fetch_json(url)
+    data = await cached_fetch_json(url, ttl=60)
     if not data or 'result' not in data or data['result'] != 'success':
         return
 
@@ -219,31 +252,28 @@ class WebSearch(InlineModuleBase):
         'commands': InlineCommand(
             pattern=re.compile(r'^(commands|help)$'),
             handler=list_all_inline_commands,
-            name=t('list_commands'),
+            name=LazyStr('list_commands'),
         ),
         'ddg': InlineCommand(
-            pattern=re.compile(r'^ddg\s+(.+)$'),
             handler=handle_duckduckgo_search,
-            name=t('duckduckgo_search'),
+            name=LazyStr('duckduckgo_search'),
         ),
         'exchange': InlineCommand(
             pattern=re.compile(r'^exchange\s+(\d+(?:\.\d+)?)\s+([A-Z]{3})\s+([A-Z]{3})$'),
             handler=handle_exchange,
-            name=t('currency_exchange'),
+            name=LazyStr('currency_exchange'),
         ),
         'hadith': InlineCommand(
-            pattern=re.compile(r'^hadith\s+(.+)$'),
             handler=handle_hadith_search,
-            name=t('hadith_search'),
+            name=LazyStr('hadith_search'),
         ),
         'quran': InlineCommand(
-            pattern=re.compile(r'^quran\s+(.+)$'),
             handler=handle_quran_search,
-            name=t('quran_search'),
+            name=LazyStr('quran_search'),
         ),
         'wiki': InlineCommand(
             pattern=re.compile(r'^wiki\s+([a-z]{2})\s+(.+)$'),
             handler=handle_wikipedia_search,
-            name=t('wikipedia_search'),
+            name=LazyStr('wikipedia_search'),
         ),
     }
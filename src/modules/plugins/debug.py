@@ -8,12 +8,14 @@ from src.modules.base import ModuleBase
 from src.utils.command import Command
 from src.utils.filters import is_reply_in_private
 from src.utils.i18n import t
-from src.utils.json import json_options, process_dict
+from src.utils.json import bytes_default, json_options
 
 
 async def to_json(event: NewMessage.Event) -> None:
     reply_message = await event.get_reply_message()
-    json_str = orjson.dumps(process_dict(reply_message.to_dict()), option=json_options).decode()
+    json_str = orjson.dumps(
+        reply_message.to_dict(), default=bytes_default, option=json_options
+    ).decode()
     await event.reply(f'<pre>{json_str}</pre>')
 
 
@@ -1,12 +1,12 @@
+import re
 from pathlib import Path
 from tempfile import NamedTemporaryFile
 from typing import ClassVar
 
-import regex as re
 from telethon.events import CallbackQuery, NewMessage
 from telethon.tl.custom import Message
 
-from src import DOWNLOADS_DIR, PARENT_DIR
+from src import DOWNLOADS_DIR, PARENT_DIR, TMP_DIR
 from src.modules.base import ModuleBase
 from src.modules.plugins.run import stream_shell_output
 from src.utils.command import Command
@@ -19,9 +19,11 @@ from src.utils.filters import (
     is_file,
 )
 from src.utils.i18n import t
-from src.utils.patterns import HTTP_URL_PATTERN
+from src.utils.patterns import HTTP_URL_REGEX
 from src.utils.telegram import get_reply_message
 
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
 
 async def download_from_url(
     event: NewMessage.Event | CallbackQuery.Event,
@@ -39,7 +41,7 @@ async def download_from_url(
 async def download_file_command(event: NewMessage.Event | CallbackQuery.Event) -> None:
     progress_message = await event.reply(t('starting_file_download'))
     reply_message = await get_reply_message(event, previous=True)
-    if url_match := re.search(HTTP_URL_PATTERN, reply_message.raw_text):
+    if url_match := HTTP_URL_REGEX.search(reply_message.raw_text):
         url = url_match.group(0)
         download_to = await download_from_url(
             event, url, DOWNLOADS_DIR, progress_message=progress_message
@@ -50,9 +52,8 @@ async def download_file_command(event: NewMessage.Event | CallbackQuery.Event) -
     else:
         reply_message = await get_reply_message(event, previous=True)
         download_to = DOWNLOADS_DIR / get_download_name(reply_message)
-        with download_to.open('wb') as temp_file:
-            temp_file_path = await download_file(event, temp_file, reply_message, progress_message)
-            temp_file_path.rename(download_to)
+        with download_to.open('wb', buffering=WRITE_BUFFER_SIZE) as temp_file:
+            await download_file(event, temp_file, reply_message, progress_message)
     await progress_message.edit(f'{t('file_downloaded')}: <code>{download_to}</code>')
 
 
@@ -70,7 +71,7 @@ async def upload_from_url_command(event: NewMessage.Event) -> None:
     reply_message = await get_reply_message(event, previous=True)
     message = reply_message or event.message
     custom_name = ''
-    url_match = re.search(HTTP_URL_PATTERN, message.raw_text)
+    url_match = HTTP_URL_REGEX.search(message.raw_text)
     if url_match:
         url = url_match.group(0)
     else:
@@ -110,11 +111,22 @@ async def upload_as_file_or_media(event: NewMessage.Event | CallbackQuery.Event)
     progress_message = await event.reply(t('starting_file_download'))
     _type = 'file' if force_document else 'media'
     output_file_name = f'{reply_message.file.name or _type}{reply_message.file.ext}'
-    with NamedTemporaryFile() as temp_file:
-        temp_file_path = await download_file(event, temp_file, reply_message, progress_message)
-        await progress_message.edit(t('download_complete_starting_upload'))
-        temp_file_path = temp_file_path.rename(temp_file_path.with_name(output_file_name))
-        await upload_file(event, temp_file_path, progress_message, force_document=force_document)
+    # Resending the existing media isn't enough here: Telegram keeps the document's original
+    # attributes and ignores force_document for already uploaded files, so it must be re-uploaded.
+    with NamedTemporaryFile(dir=TMP_DIR, delete=False, buffering=WRITE_BUFFER_SIZE) as temp_file:
+        temp_file_path = Path(temp_file.name)
+        try:
+            await download_file(event, temp_file, reply_message, progress_message)
+            # flush the download before the file is renamed and read back for the upload
+            temp_file.close()
+            await progress_message.edit(t('download_complete_starting_upload'))
+            # same-directory rename, so this never falls back to a cross-device copy
+            temp_file_path = temp_file_path.replace(temp_file_path.with_name(output_file_name))
+            await upload_file(
+                event, temp_file_path, progress_message, force_document=force_document
+            )
+        finally:
+            temp_file_path.unlink(missing_ok=True)
 
     await progress_message.edit(f'{t('file_uploaded_as')} {_type}: <code>{output_file_name}</code>')
 
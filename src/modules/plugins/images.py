@@ -2,6 +2,7 @@ from functools import partial
 from itertools import zip_longest
 from pathlib import Path
 from tempfile import NamedTemporaryFile
+from types import MappingProxyType
 from typing import ClassVar
 
 import pymupdf
@@ -10,7 +11,13 @@ from telethon import Button
 from telethon.events import CallbackQuery, NewMessage
 
 from src import TMP_DIR
-from src.modules.base import CommandHandlerDict, ModuleBase, dynamic_handler
+from src.modules.base import (
+    CommandHandlerDict,
+    ModuleBase,
+    dynamic_handler,
+    get_callback_handlers,
+    get_pattern_handlers,
+)
 from src.utils.command import Command
 from src.utils.downloads import download_file, upload_file
 from src.utils.filters import has_photo_or_photo_file
@@ -55,7 +62,7 @@ async def convert_image(event: NewMessage.Event | CallbackQuery.Event) -> None:
             await event.edit(f'{t('choose_target_format')}:', buttons=buttons)
             return
     else:
-        target_format = event.message.text.split('convert ')[1]
+        target_format = event.message.text.partition('convert ')[2]
         if target_format not in ALLOWED_OUTPUT_FORMATS:
             await event.reply(
                 f'{t('unsupported_media_type')}.\n'
@@ -123,13 +130,15 @@ async def ocr_image(event: NewMessage.Event) -> None:
     await progress_message.edit(t('image_ocr_complete'))
 
 
-handlers: CommandHandlerDict = {
-    'image convert': convert_image,
-    'image ocr': ocr_image,
-    'image trim': trim_image,
-}
+handlers: CommandHandlerDict = MappingProxyType(
+    {
+        'image convert': convert_image,
+        'image ocr': ocr_image,
+        'image trim': trim_image,
+    }
+)
 
-handler = partial(dynamic_handler, handlers)
+handler = partial(dynamic_handler, get_pattern_handlers(handlers), get_callback_handlers(handlers))
 
 
 class Images(ModuleBase):
@@ -1,73 +1,191 @@
+import asyncio
 import contextlib
 from collections import defaultdict
-from datetime import datetime
+from collections.abc import Iterator
 from functools import partial
 from itertools import zip_longest
 from math import floor
 from os import getenv
 from pathlib import Path
-from shutil import rmtree
-from tempfile import NamedTemporaryFile
+from shutil import disk_usage, rmtree
+from tempfile import NamedTemporaryFile, _TemporaryFileWrapper
+from time import monotonic
+from types import MappingProxyType
 from typing import Any, ClassVar, cast
 from uuid import uuid4
 
 import orjson
 import regex as re
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
 from telethon import Button, TelegramClient
 from telethon.events import CallbackQuery, NewMessage, StopPropagation
 from telethon.tl.custom import Message
 from telethon.tl.types import DocumentAttributeAudio, DocumentAttributeVideo
 
-from src import TMP_DIR
-from src.modules.base import CommandHandlerDict, ModuleBase, dynamic_handler
-from src.modules.plugins.run import stream_shell_output
+from src import SHM_DIR, TMP_DIR
+from src.modules.base import (
+    CommandHandlerDict,
+    ModuleBase,
+    dynamic_handler,
+    get_callback_handlers,
+    get_pattern_handlers,
+)
+from src.modules.plugins.run import reply_with_progress, stream_shell_output
 from src.utils.command import Command
-from src.utils.downloads import download_file, get_download_name, upload_file
-from src.utils.filters import has_media, is_valid_reply_state
+from src.utils.downloads import (
+    download_file,
+    get_download_name,
+    iter_download_parts,
+    upload_file,
+)
+from src.utils.filters import (
+    has_any_media,
+    has_audio,
+    has_audio_or_voice,
+    has_no_audio,
+    has_no_voice,
+    has_video,
+    has_video_or_video_note,
+    is_collecting,
+    is_valid_reply_state,
+)
 from src.utils.i18n import t
 from src.utils.json import json_options, process_dict
 from src.utils.reply import (
     MergeState,
+    MergeStateT,
     ReplyState,
     StateT,
+    UserMergeState,
+    UserReplyState,
     handle_callback_query_for_reply_state,
+    sweep_merge_states,
 )
-from src.utils.run import run_command
+from src.utils.run import run_command, run_command_bytes
 from src.utils.subtitles import srt_to_txt
 from src.utils.telegram import delete_message_after, edit_or_send_as_file, get_reply_message
 
-ffprobe_command = 'ffprobe -v quiet -print_format json -show_format -show_streams "{input}"'
-reply_states: StateT = defaultdict(
-    lambda: {'state': ReplyState.WAITING, 'media_message_id': None, 'reply_message_id': None}
+ffprobe_command = [
+    'ffprobe',
+    '-v',
+    'quiet',
+    '-print_format',
+    'json',
+    '-show_format',
+    '-show_streams',
+]
+reply_states: StateT = defaultdict(UserReplyState)
+merge_states: MergeStateT = {}
+video_create_states: MergeStateT = {}
+video_update_states: MergeStateT = {}
+# ffprobe results of replied media, keyed by (chat id, message id, file size)
+PROBE_CACHE_SIZE = 256
+PROBE_CACHE_TTL = 60 * 60
+# Containers ffmpeg can demux from a non-seekable pipe
+STREAMABLE_EXTENSIONS = frozenset(
+    {'.aac', '.flac', '.mka', '.mkv', '.mp3', '.oga', '.ogg', '.opus', '.ts', '.wav', '.webm'}
 )
-merge_states: StateT = defaultdict(lambda: {'state': MergeState.IDLE, 'files': []})
-video_create_states: StateT = defaultdict(lambda: {'state': MergeState.IDLE, 'files': []})
-video_update_states: StateT = defaultdict(lambda: {'state': MergeState.IDLE, 'files': []})
+CUT_POINTS_PATTERN = re.compile(r'(\d{2}:\d{2}:\d{2})\s+(\d{2}:\d{2}:\d{2})')
+# Replies expected by handlers waiting for user input
+CUT_POINTS_MESSAGE_PATTERN = re.compile(
+    r'^(\d{2}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2}(\s+\d{2}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2})*)$'
+)
+METADATA_PATTERN = re.compile(r'^.+\s+-\s+.+$')
+SPLIT_DURATION_PATTERN = re.compile(r'^(\d+[hms])$')
+# Subtitle codecs whose name is not a usable output extension
+SUBTITLE_EXTENSIONS = {
+    'ass': 'ass',
+    'mov_text': 'srt',
+    'ssa': 'ssa',
+    'subrip': 'srt',
+    'webvtt': 'vtt',
+    'hdmv_pgs_subtitle': 'sup',
+}
+# Matroska subtitles take any subtitle codec, for the ones without a muxer of their own
+DEFAULT_SUBTITLE_EXTENSION = 'mks'
+TIME_PATTERN = re.compile(r'(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d')
+probe_cache: dict[tuple[int, int, int], tuple[float, dict[str, Any]]] = {}
+FFMPEG = ('ffmpeg', '-hide_banner', '-y')
+# Hardware H.264 encoders preferred over libx264 when available, with their encoding options
+HW_H264_ENCODERS = {
+    'h264_nvenc': ['-preset', 'p4', '-rc:v', 'vbr', '-cq', '23'],
+    'h264_qsv': ['-preset', 'veryfast'],
+}
+# Hardware decoders paired with the hardware encoders, as (hwaccel, decoded frames format)
+HW_DECODERS = {'h264_nvenc': ('cuda', 'cuda')}
+encoder_cache: dict[str, list[str]] = {}
+h264_encoder_lock = asyncio.Lock()
+ffmpeg_encoders: set[str] = set()
+ffmpeg_encoders_lock = asyncio.Lock()
+shm_reserved_bytes = 0
+
+
+@contextlib.contextmanager
+def reserve_temp_dir(*messages: Message) -> Iterator[Path]:
+    """Use RAM backed /dev/shm for media work files when there is room for input and output."""
+    global shm_reserved_bytes  # noqa: PLW0603
+    size = sum(message.file.size or 0 for message in messages) * 2
+    if not SHM_DIR.is_dir() or disk_usage(SHM_DIR).free - shm_reserved_bytes <= size:
+        yield TMP_DIR
+        return
+    # hold the space until the job is done, so concurrent jobs don't count on the same free space
+    shm_reserved_bytes += size
+    try:
+        yield SHM_DIR
+    finally:
+        shm_reserved_bytes -= size
 
 
-async def get_stream_info(stream_specifier: str, file_path: Path) -> dict[str, Any]:
-    output, _ = await run_command(
-        f'ffprobe -v error -select_streams {stream_specifier} -show_entries '
-        f'stream=codec_name,duration,width,height -of json "{file_path}"'
-    )
-    _info = orjson.loads(output)
-    return cast(dict[str, Any], _info['streams'][0]) if _info and _info.get('streams') else {}
+def get_file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
 
+async def is_non_empty(path: Path) -> bool:
+    # stat and unlink calls run in a thread to not block other users' events on slow disks
+    return await asyncio.to_thread(get_file_size, path) > 0
 
-async def get_format_info(file_path: Path) -> dict[str, Any]:
-    output, _ = await run_command(
-        f'ffprobe -v error -show_entries format=duration,tags -of json "{file_path}"'
+
+def remove_files(*paths: Path | str) -> None:
+    for path in paths:
+        Path(path).unlink(missing_ok=True)
+
+
+def get_cached_probe(message: Message) -> dict[str, Any] | None:
+    cached = probe_cache.get((message.chat_id, message.id, message.file.size))
+    return cached[1] if cached and cached[0] > monotonic() else None
+
+
+async def probe_file(file_path: Path | str) -> dict[str, Any] | None:
+    # orjson parses the ffprobe output bytes as they are, without decoding them first
+    output, code = await run_command_bytes([*ffprobe_command, str(file_path)])
+    return None if code else cast(dict[str, Any], orjson.loads(output))
+
+
+async def get_probe(message: Message, file_path: Path | str) -> dict[str, Any] | None:
+    """Return ffprobe streams and format info of a downloaded message media, cached per message."""
+    if (info := get_cached_probe(message)) is not None:
+        return info
+    if (info := await probe_file(file_path)) is None:
+        return None
+    if len(probe_cache) >= PROBE_CACHE_SIZE:
+        del probe_cache[next(iter(probe_cache))]
+    probe_cache[(message.chat_id, message.id, message.file.size)] = (
+        monotonic() + PROBE_CACHE_TTL,
+        info,
     )
-    _info = orjson.loads(output)
-    return cast(dict[str, Any], _info['format']) if _info.get('format') else {}
+    return info
 
 
 async def get_output_info(file_path: Path) -> dict[str, Any]:
-    video_info = await get_stream_info('v:0', file_path)
-    audio_info = await get_stream_info('a:0', file_path)
-    format_info = await get_format_info(file_path)
+    probe = await probe_file(file_path) or {}
+    streams = probe.get('streams', [])
+    video_info, audio_info = (
+        next((stream for stream in streams if stream.get('codec_type') == codec_type), {})
+        for codec_type in ('video', 'audio')
+    )
+    format_info = probe.get('format', {})
 
     info = {
         'vcodec': video_info.get('codec_name', 'none'),
@@ -86,46 +204,129 @@ async def get_output_info(file_path: Path) -> dict[str, Any]:
     return info
 
 
-async def get_media_bitrate(file_path: str) -> tuple[int, int]:
-    async def get_bitrate(stream_specifier: str) -> int:
-        _output, _ = await run_command(
-            f'ffprobe -v error -select_streams {stream_specifier} -show_entries '
-            f'stream=bit_rate -of csv=p=0 "{file_path}"'
-        )
-        _output = _output.strip()
-        return int(_output) if _output.isdigit() else 0
+async def get_media_bitrate(message: Message, file_path: Path | str) -> tuple[int, int]:
+    info = await get_probe(message, file_path) or {}
+
+    def to_int(bit_rate: Any) -> int:
+        return int(bit_rate) if str(bit_rate).isdigit() else 0
 
-    video_bitrate = await get_bitrate('v:0')
-    audio_bitrate = await get_bitrate('a:0')
+    streams = info.get('streams', [])
+    video_bitrate, audio_bitrate = (
+        to_int(next((s for s in streams if s.get('codec_type') == codec_type), {}).get('bit_rate'))
+        for codec_type in ('video', 'audio')
+    )
 
     if video_bitrate == 0 and audio_bitrate == 0:
-        output, _ = await run_command(
-            f'ffprobe -v error -show_entries format=bit_rate -of csv=p=0 "{file_path}"'
-        )
         # Assume it's all audio if we couldn't get separate streams
-        audio_bitrate = int(output.strip() or 0)
+        audio_bitrate = to_int(info.get('format', {}).get('bit_rate'))
 
     return video_bitrate, audio_bitrate
 
 
+def is_streamable(message: Message) -> bool:
+    # mp4/mov inputs may have their index at the end of the file, so they need a seekable input
+    return bool(message.file and message.file.ext in STREAMABLE_EXTENSIONS)
+
+
+async def has_encoder(name: str) -> bool:
+    """Check whether ffmpeg is built with an encoder, listing them only once."""
+    if not ffmpeg_encoders:
+        # concurrent first callers wait for a single ffmpeg -encoders run
+        async with ffmpeg_encoders_lock:
+            if not ffmpeg_encoders:
+                output, _ = await run_command([*FFMPEG, '-encoders'])
+                ffmpeg_encoders.update(
+                    fields[1] for line in output.splitlines() if len(fields := line.split()) > 1
+                )
+    return name in ffmpeg_encoders
+
+
+async def get_h264_encoder() -> list[str]:
+    """Return the video codec arguments of a working hardware H.264 encoder, or libx264."""
+    if 'h264' in encoder_cache:
+        return encoder_cache['h264']
+    async with h264_encoder_lock:
+        if 'h264' in encoder_cache:
+            return encoder_cache['h264']
+        codec = ['-c:v', 'libx264']
+        for encoder, options in HW_H264_ENCODERS.items():
+            if not await has_encoder(encoder):
+                continue
+            # encoders are listed whenever ffmpeg is built with them, make sure the device works
+            _, code = await run_command(
+                [
+                    *FFMPEG,
+                    '-f',
+                    'lavfi',
+                    '-i',
+                    'color=size=256x256:duration=0.1',
+                    '-frames:v',
+                    '1',
+                    '-c:v',
+                    encoder,
+                    '-f',
+                    'null',
+                    '-',
+                ]
+            )
+            if code == 0:
+                codec = ['-c:v', encoder, *options]
+                break
+        encoder_cache['h264'] = codec
+    return codec
+
+
+async def get_hwaccel_options(keep_frames_on_device: bool = True) -> list[str]:
+    """
+    Return input options to decode on the device of the selected H.264 encoder, if it has one.
+
+    Decoded frames stay on the device unless `keep_frames_on_device` is False, which is needed
+    when software filters run between decoding and encoding.
+    """
+    encoder = (await get_h264_encoder())[1]
+    if encoder not in HW_DECODERS:
+        return []
+    hwaccel, output_format = HW_DECODERS[encoder]
+    if keep_frames_on_device:
+        return ['-hwaccel', hwaccel, '-hwaccel_output_format', output_format]
+    return ['-hwaccel', hwaccel]
+
+
+def format_command(command: list[str], **kwargs: Any) -> list[str]:
+    """Replace `{name}` placeholder arguments, other arguments are passed as they are."""
+    placeholders = {f'{{{key}}}': str(value) for key, value in kwargs.items()}
+    return [placeholders.get(arg, arg) for arg in command]
+
+
 async def process_media(
     event: NewMessage.Event,
-    ffmpeg_command: str,
+    ffmpeg_command: list[str],
     output_suffix: str,
     reply_message: Message | None = None,
     is_voice: bool = False,
     get_file_name: bool = True,
     get_bitrate: bool = False,
     feedback_text: str = t('file_processed'),
+    *,
+    stream_input: bool = False,
 ) -> dict[str, Any]:
     data: dict[str, Any] = {}
     if not reply_message:
         reply_message = await get_reply_message(event, previous=True)
-    status_message = await event.reply(t('starting_process'))
-    progress_message = await event.reply(f'<pre>{t('process_output')}:</pre>')
+    status_message, progress_message = await reply_with_progress(event, t('starting_process'))
+    stream_input = stream_input and not get_bitrate and is_streamable(reply_message)
 
-    with NamedTemporaryFile(dir=TMP_DIR) as temp_file:
-        temp_file_path = await download_file(event, temp_file, reply_message, progress_message)
+    with (
+        reserve_temp_dir(reply_message) as temp_dir,
+        NamedTemporaryFile(dir=temp_dir) as temp_file,
+    ):
+        if stream_input:
+            # Pipe the media into ffmpeg while it is being downloaded
+            temp_file_path = Path(temp_file.name)
+            input_name = 'pipe:0'
+        else:
+            temp_file_path = await download_file(event, temp_file, reply_message, progress_message)
+            input_name = temp_file.name
         if get_file_name:
             input_file = get_download_name(reply_message)
             output_file = (temp_file_path.parent / input_file).with_suffix(output_suffix)
@@ -135,49 +336,60 @@ async def process_media(
             output_file = temp_file_path.with_suffix(output_suffix)
 
         if get_bitrate:
-            video_bitrate, audio_bitrate = await get_media_bitrate(temp_file.name)
-            ffmpeg_command = ffmpeg_command.format(
+            video_bitrate, audio_bitrate = await get_media_bitrate(reply_message, temp_file.name)
+            ffmpeg_command = format_command(
+                ffmpeg_command,
                 input=temp_file.name,
                 output=output_file,
                 video_bitrate=video_bitrate,
                 audio_bitrate=audio_bitrate,
             )
         else:
-            ffmpeg_command = ffmpeg_command.format(input=temp_file.name, output=output_file)
-
-        status = await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
-        data['status_text'] = status
-        if not output_file.exists() or not output_file.stat().st_size:
-            await status_message.edit(t('process_failed'))
-            return data
-
-        output_info = await get_output_info(output_file)
-        if output_info.get('vcodec') == 'none':
-            attributes = [
-                DocumentAttributeAudio(
-                    duration=int(output_info.get('duration', 0)),
-                    title=output_info.get('title'),
-                    performer=output_info.get('uploader'),
-                )
-            ]
-        else:
-            attributes = [
-                DocumentAttributeVideo(
-                    duration=int(output_info.get('duration', 0)),
-                    w=output_info.get('width', 0),
-                    h=output_info.get('height', 0),
-                )
-            ]
+            ffmpeg_command = format_command(ffmpeg_command, input=input_name, output=output_file)
+
+        try:
+            status, code = await stream_shell_output(
+                event,
+                ffmpeg_command,
+                status_message,
+                progress_message,
+                stdin=iter_download_parts(event, reply_message) if stream_input else None,
+            )
+            data['status_text'] = status
+            if (stream_input and code != 0) or not await is_non_empty(output_file):
+                await status_message.edit(t('process_failed'))
+                return data
+
+            output_info = await get_output_info(output_file)
+            if output_info.get('vcodec') == 'none':
+                attributes = [
+                    DocumentAttributeAudio(
+                        duration=int(output_info.get('duration', 0)),
+                        title=output_info.get('title'),
+                        performer=output_info.get('uploader'),
+                    )
+                ]
+            else:
+                attributes = [
+                    DocumentAttributeVideo(
+                        duration=int(output_info.get('duration', 0)),
+                        w=output_info.get('width', 0),
+                        h=output_info.get('height', 0),
+                    )
+                ]
 
-        await upload_file(
-            event,
-            output_file,
-            progress_message,
-            is_voice,
-            force_document=False,
-            attributes=attributes,
-        )
-        data['output_size'] = output_file.stat().st_size
+            await upload_file(
+                event,
+                output_file,
+                progress_message,
+                is_voice,
+                force_document=False,
+                attributes=attributes,
+            )
+            data['output_size'] = await asyncio.to_thread(get_file_size, output_file)
+        finally:
+            # outputs may be in RAM backed /dev/shm, don't keep them after they are sent
+            await asyncio.to_thread(remove_files, output_file)
 
     await status_message.edit(feedback_text)
     data['status_message'] = status_message
@@ -185,13 +397,35 @@ async def process_media(
 
 
 async def convert_to_voice_note(event: NewMessage.Event | CallbackQuery.Event) -> None:
-    ffmpeg_command = 'ffmpeg -hide_banner -y -i "{input}" -vn -c:a libopus -b:a 48k "{output}"'
+    # VBR mono opus tuned for speech, at opus' native sample rate
+    ffmpeg_command = [
+        *FFMPEG,
+        '-i',
+        '{input}',
+        '-vn',
+        '-c:a',
+        'libopus',
+        '-b:a',
+        '48k',
+        '-vbr',
+        'on',
+        '-compression_level',
+        '10',
+        '-application',
+        'voip',
+        '-ac',
+        '1',
+        '-ar',
+        '48000',
+        '{output}',
+    ]
     await process_media(
         event,
         ffmpeg_command,
         '.ogg',
         is_voice=True,
         feedback_text=t('converted_to_voice_note'),
+        stream_input=True,
     )
 
 
@@ -214,32 +448,53 @@ async def compress_audio(event: NewMessage.Event | CallbackQuery.Event) -> None:
             ]
             await event.edit(f'{t('choose_bitrate')}:', buttons=buttons)
             return
-    elif match := re.search(r'(\d+)$', event.message.text):
-        audio_bitrate = match.group(1)
     else:
-        await event.reply(t('invalid_bitrate'))
-        return
-    ffmpeg_command = (
-        f'ffmpeg -hide_banner -y -i "{{input}}" -vn -c:a aac -b:a {audio_bitrate}k "{{output}}"'
-    )
+        audio_bitrate = event.message.text.rsplit(' ', 1)[-1]
+        if not audio_bitrate.isdigit():
+            await event.reply(t('invalid_bitrate'))
+            return
+    ffmpeg_command = [
+        *FFMPEG,
+        '-i',
+        '{input}',
+        '-vn',
+        '-c:a',
+        'aac',
+        '-b:a',
+        f'{audio_bitrate}k',
+        '{output}',
+    ]
     await process_media(
         event,
         ffmpeg_command,
         '.m4a',
         feedback_text=t('audio_successfully_compressed'),
+        stream_input=True,
     )
     if delete_message_after_process:
         await delete_message_after(await event.get_message())
 
 
+# Audio that fits in the m4a output as it is, so it is copied instead of re-encoded
+COPYABLE_AUDIO_EXTENSIONS = frozenset({'.aac', '.m4a', '.mp3'})
+
+
 async def convert_to_audio(event: NewMessage.Event | CallbackQuery.Event) -> None:
     reply_message = await get_reply_message(event, previous=True)
-    if reply_message.file and reply_message.file.ext in ['aac', 'm4a', 'mp3']:
-        ffmpeg_command = 'ffmpeg -hide_banner -y -i "{input}" -vn -c:a copy "{output}"'
+    if reply_message.file and reply_message.file.ext in COPYABLE_AUDIO_EXTENSIONS:
+        ffmpeg_command = [*FFMPEG, '-i', '{input}', '-vn', '-c:a', 'copy', '{output}']
     else:
-        ffmpeg_command = (
-            'ffmpeg -hide_banner -y -i "{input}" -vn -c:a aac -b:a {audio_bitrate} "{output}"'
-        )
+        ffmpeg_command = [
+            *FFMPEG,
+            '-i',
+            '{input}',
+            '-vn',
+            '-c:a',
+            'aac',
+            '-b:a',
+            '{audio_bitrate}',
+            '{output}',
+        ]
     await process_media(
         event,
         ffmpeg_command,
@@ -250,6 +505,11 @@ async def convert_to_audio(event: NewMessage.Event | CallbackQuery.Event) -> Non
     )
 
 
+def hms_to_seconds(value: str) -> int:
+    hours, minutes, seconds = map(int, value.split(':'))
+    return hours * 3600 + minutes * 60 + seconds
+
+
 async def cut_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
     if isinstance(event, CallbackQuery.Event):
         return await handle_callback_query_for_reply_state(
@@ -258,30 +518,28 @@ async def cut_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
             f'{t('enter_cut_points')} (<code>00:00:00 00:30:00 00:45:00 01:15:00</code>)',
         )
     if event.sender_id in reply_states:
-        reply_states[event.sender_id]['state'] = ReplyState.PROCESSING
+        reply_states[event.sender_id].state = ReplyState.PROCESSING
         reply_message = await event.client.get_messages(
-            event.chat_id, ids=reply_states[event.sender_id]['media_message_id']
+            event.chat_id, ids=reply_states[event.sender_id].media_message_id
         )
     else:
         reply_message = await get_reply_message(event, previous=True)
 
-    cut_points = re.findall(r'(\d{2}:\d{2}:\d{2})\s+(\d{2}:\d{2}:\d{2})', event.message.text)
+    cut_points = CUT_POINTS_PATTERN.findall(event.message.text)
     if not cut_points:
         await event.reply(t('invalid_cut_points'))
         return None
 
-    try:
-        # Simple validation of time format
-        for start_time, end_time in cut_points:
-            datetime.strptime(start_time, '%H:%M:%S')  # noqa: DTZ007
-            datetime.strptime(end_time, '%H:%M:%S')  # noqa: DTZ007
-    except ValueError:
+    # Simple validation of time format
+    if not all(TIME_PATTERN.fullmatch(time) for cut_point in cut_points for time in cut_point):
         await event.reply(t('invalid_time_format'))
         return None
 
-    status_message = await event.reply(t('starting_cut'))
-    progress_message = await event.reply(f'<pre>{t('process_output')}:</pre>')
-    with NamedTemporaryFile(suffix=reply_message.file.ext) as temp_file:
+    status_message, progress_message = await reply_with_progress(event, t('starting_cut'))
+    with (
+        reserve_temp_dir(reply_message) as temp_dir,
+        NamedTemporaryFile(suffix=reply_message.file.ext, dir=temp_dir) as temp_file,
+    ):
         temp_file_path = await download_file(event, temp_file, reply_message, progress_message)
         input_file = get_download_name(reply_message)
         output_file_base = (temp_file_path.parent / input_file).with_suffix('')
@@ -290,13 +548,27 @@ async def cut_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
             output_file = output_file_base.with_name(
                 f'{output_file_base.stem}_cut_{idx}{reply_message.file.ext}'
             )
-            ffmpeg_command = (
-                f'ffmpeg -hide_banner -y -i "{temp_file.name}" '
-                f'-ss {start_time} -to {end_time} '
-                f'-c copy -map 0 "{output_file}"'
-            )
+            # seeking before -i jumps straight to the nearest keyframe instead of decoding up
+            # to start_time, timestamps are reset so use a duration instead of -to
+            duration = hms_to_seconds(end_time) - hms_to_seconds(start_time)
+            ffmpeg_command = [
+                *FFMPEG,
+                '-ss',
+                start_time,
+                '-i',
+                temp_file.name,
+                '-t',
+                str(duration),
+                '-c',
+                'copy',
+                '-map',
+                '0',
+                '-avoid_negative_ts',
+                'make_zero',
+                str(output_file),
+            ]
             await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
-            if output_file.exists() and output_file.stat().st_size:
+            if await is_non_empty(output_file):
                 await upload_file(
                     event,
                     output_file,
@@ -306,7 +578,7 @@ async def cut_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
                 )
             else:
                 await status_message.edit(t('cut_failed_for_item', item=idx))
-            output_file.unlink(missing_ok=True)
+            await asyncio.to_thread(remove_files, output_file)
 
     await status_message.edit(t('cut_completed'))
     if event.sender_id in reply_states:
@@ -321,9 +593,9 @@ async def split_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
         )
 
     if event.sender_id in reply_states:
-        reply_states[event.sender_id]['state'] = ReplyState.PROCESSING
+        reply_states[event.sender_id].state = ReplyState.PROCESSING
         reply_message = await event.client.get_messages(
-            event.chat_id, ids=reply_states[event.sender_id]['media_message_id']
+            event.chat_id, ids=reply_states[event.sender_id].media_message_id
         )
         args = event.message.text
     else:
@@ -338,25 +610,37 @@ async def split_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
         segment_duration = duration * 60
     else:
         segment_duration = duration
-    status_message = await event.reply(t('starting_process'))
-
-    progress_message = await event.reply(f'<pre>{t('process_output')}:</pre>')
-    with NamedTemporaryFile() as temp_file:
+    status_message, progress_message = await reply_with_progress(event, t('starting_process'))
+    with (
+        reserve_temp_dir(reply_message) as temp_dir,
+        NamedTemporaryFile(dir=temp_dir) as temp_file,
+    ):
         temp_file_path = await download_file(event, temp_file, reply_message, progress_message)
         input_file = get_download_name(reply_message)
         output_file_base = (temp_file_path.parent / input_file).with_suffix('')
 
         output_pattern = f'{output_file_base.stem}_segment_%03d{input_file.suffix}'
-        ffmpeg_command = (
-            f'ffmpeg -hide_banner -y -i "{temp_file.name}" -f segment -segment_time {segment_duration} '
-            f'-c copy "{output_file_base.parent / output_pattern}"'
-        )
+        ffmpeg_command = [
+            *FFMPEG,
+            '-i',
+            temp_file.name,
+            '-f',
+            'segment',
+            '-segment_time',
+            str(segment_duration),
+            '-c',
+            'copy',
+            str(output_file_base.parent / output_pattern),
+        ]
         await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
 
-        for output_file in sorted(
-            output_file_base.parent.glob(f'{output_file_base.stem}_segment_*{input_file.suffix}')
-        ):
-            if output_file.exists() and output_file.stat().st_size:
+        segments = await asyncio.to_thread(
+            sorted,
+            output_file_base.parent.glob(f'{output_file_base.stem}_segment_*{input_file.suffix}'),
+        )
+        # segments are only useful in order, so they are uploaded one after another
+        for output_file in segments:
+            if await is_non_empty(output_file):
                 await upload_file(
                     event,
                     output_file,
@@ -366,7 +650,7 @@ async def split_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
                 )
             else:
                 await status_message.edit(t('process_failed_for_file', file_name=output_file.name))
-            output_file.unlink(missing_ok=True)
+            await asyncio.to_thread(remove_files, output_file)
 
     await progress_message.edit(t('file_split_and_uploaded'))
     if event.sender_id in reply_states:
@@ -377,15 +661,16 @@ async def split_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
 async def media_info(event: NewMessage.Event | CallbackQuery.Event) -> None:
     reply_message = await get_reply_message(event, previous=True)
     progress_message = await event.reply(t('starting_process'))
-    with NamedTemporaryFile() as temp_file:
-        await download_file(event, temp_file, reply_message, progress_message)
-        output, code = await run_command(ffprobe_command.format(input=temp_file.name))
-        if code:
-            message = f'{t('failed_to_get_info')}\n<pre>{output}</pre>'
-        else:
-            info = orjson.dumps(process_dict(orjson.loads(output)), option=json_options).decode()
-            message = f'<pre>{info}</pre>'
-        await edit_or_send_as_file(event, progress_message, message)
+    if (probe := get_cached_probe(reply_message)) is None:
+        with NamedTemporaryFile() as temp_file:
+            await download_file(event, temp_file, reply_message, progress_message)
+            probe = await get_probe(reply_message, temp_file.name)
+    if probe is None:
+        message = t('failed_to_get_info')
+    else:
+        info = orjson.dumps(process_dict(probe), option=json_options).decode()
+        message = f'<pre>{info}</pre>'
+    await edit_or_send_as_file(event, progress_message, message)
 
 
 async def set_metadata(event: NewMessage.Event | CallbackQuery.Event) -> None:
@@ -395,103 +680,154 @@ async def set_metadata(event: NewMessage.Event | CallbackQuery.Event) -> None:
         )
 
     if event.sender_id in reply_states:
-        reply_states[event.sender_id]['state'] = ReplyState.PROCESSING
+        reply_states[event.sender_id].state = ReplyState.PROCESSING
         reply_message = await event.client.get_messages(
-            event.chat_id, ids=reply_states[event.sender_id]['media_message_id']
+            event.chat_id, ids=reply_states[event.sender_id].media_message_id
         )
         title, artist = event.message.text.split(' - ')
     else:
         reply_message = await get_reply_message(event, previous=True)
-        title, artist = event.message.text.split('metadata ')[1].split(' - ')
-
-    ffmpeg_command = (
-        'ffmpeg -hide_banner -y -i "{input}" -c copy '
-        f'-metadata title="{title}" -metadata artist="{artist}" '
-        '"{output}"'
-    )
+        title, artist = event.message.text.partition('metadata ')[2].split(' - ')
+
+    ffmpeg_command = [
+        *FFMPEG,
+        '-i',
+        '{input}',
+        '-c',
+        'copy',
+        '-metadata',
+        f'title={title}',
+        '-metadata',
+        f'artist={artist}',
+        '{output}',
+    ]
     await process_media(
         event,
         ffmpeg_command,
         reply_message.file.ext,
         reply_message=reply_message,
         feedback_text=t('audio_metadata_set'),
+        stream_input=True,
     )
     if event.sender_id in reply_states:
         del reply_states[event.sender_id]
     raise StopPropagation
 
 
+# Inputs that ffmpeg's concat protocol can join without a concat demuxer manifest
+CONCAT_PROTOCOL_EXTENSIONS = frozenset({'.aac', '.mp3', '.ts'})
+
+
+def get_concat_input_options(
+    messages: list[Message], temp_files: list[str], temp_dir: Path
+) -> list[str]:
+    """Build ffmpeg input options joining `temp_files`, adding the manifest to them for cleanup."""
+    input_extensions = {file_message.file.ext for file_message in messages}
+    if len(input_extensions) == 1 and input_extensions <= CONCAT_PROTOCOL_EXTENSIONS:
+        # these formats can be joined byte by byte, so no manifest file is needed
+        return ['-i', f'concat:{"|".join(temp_files)}']
+    with NamedTemporaryFile(suffix='.txt', dir=temp_dir, delete=False) as file_list:
+        manifest = ''.join(f"file '{temp_file_name}'\n" for temp_file_name in temp_files)
+        file_list.write(manifest.encode())
+    temp_files.append(file_list.name)
+    return ['-f', 'concat', '-safe', '0', '-i', file_list.name]
+
+
 async def merge_media_initial(event: NewMessage.Event | CallbackQuery.Event) -> None:
-    merge_states[event.sender_id]['state'] = MergeState.COLLECTING
-    merge_states[event.sender_id]['files'] = []
+    merge_states[event.sender_id] = UserMergeState(MergeState.COLLECTING)
     reply_message = await get_reply_message(event, previous=True)
-    merge_states[event.sender_id]['files'].append(reply_message.id)
+    merge_states[event.sender_id].files.append(reply_message.id)
     await event.reply(t('send_more_files'))
 
 
 async def merge_media_add(event: NewMessage.Event) -> None:
-    merge_states[event.sender_id]['files'].append(event.id)
+    merge_states[event.sender_id].files.append(event.id)
     await event.reply(t('file_added'), buttons=[Button.inline(t('finish'), 'finish_merge')])
     raise StopPropagation
 
 
 async def merge_media_process(event: CallbackQuery.Event) -> None:
-    merge_states[event.sender_id]['state'] = MergeState.MERGING
-    files = merge_states[event.sender_id]['files']
+    merge_states[event.sender_id].state = MergeState.MERGING
+    files = merge_states[event.sender_id].files
     await event.answer(t('merging'))
 
     if len(files) < 2:
         await event.answer(t('not_enough_files'))
-        merge_states[event.sender_id]['state'] = MergeState.IDLE
+        merge_states[event.sender_id].state = MergeState.IDLE
         return
 
-    status_message = await event.respond(t('starting_merge'))
-    progress_message = await event.respond(f'<pre>{t('process_output')}:</pre>')
+    status_message, progress_message = await asyncio.gather(
+        event.respond(t('starting_merge')), event.respond(f'<pre>{t('process_output')}:</pre>')
+    )
 
     temp_files: list[str] = []
     try:
-        with NamedTemporaryFile(mode='w+', suffix='.txt', delete=False) as file_list:
-            for file_id in files:
-                message = await event.client.get_messages(event.chat_id, ids=file_id)
-                with NamedTemporaryFile(suffix=message.file.ext, delete=False) as temp_file:
+        messages: list[Message] = await event.client.get_messages(event.chat_id, ids=files)
+        message = messages[-1]
+        with reserve_temp_dir(*messages) as temp_dir:
+            semaphore = asyncio.Semaphore(4)
+
+            async def download_input(
+                temp_file: _TemporaryFileWrapper, file_message: Message
+            ) -> None:
+                async with semaphore:
+                    await download_file(event, temp_file, file_message, progress_message)
+
+            with contextlib.ExitStack() as stack:
+                downloads = []
+                # the same file added more than once is downloaded once and listed again
+                downloaded: dict[tuple[str, int], str] = {}
+                for file_message in messages:
+                    key = (file_message.file.id, file_message.file.size)
+                    if key in downloaded:
+                        temp_files.append(downloaded[key])
+                        continue
+                    temp_file = stack.enter_context(
+                        NamedTemporaryFile(suffix=file_message.file.ext, dir=temp_dir, delete=False)
+                    )
+                    downloaded[key] = temp_file.name
                     temp_files.append(temp_file.name)
-                    await download_file(event, temp_file, message, progress_message)
-                    file_list.write(f"file '{temp_file.name}'\n")
-
-        with NamedTemporaryFile(suffix=message.file.ext, delete=False) as output_file:
-            ffmpeg_command = f'ffmpeg -hide_banner -y -f concat -safe 0 -i "{file_list.name}" -c copy "{output_file.name}"'
-            await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
-            output_file_path = Path(output_file.name)
-            if output_file_path.exists() and output_file_path.stat().st_size:
-                await upload_file(
-                    event,
-                    output_file_path,
-                    progress_message,
-                    is_voice=message.voice is not None,
-                )
-                await status_message.edit(t('merge_completed'))
-            else:
-                await status_message.edit(t('merge_failed'))
+                    downloads.append(download_input(temp_file, file_message))
+                # the inputs are independent, download a few of them at a time
+                await asyncio.gather(*downloads)
+
+            input_options = get_concat_input_options(messages, temp_files, temp_dir)
+            with NamedTemporaryFile(
+                suffix=message.file.ext, dir=temp_dir, delete=False
+            ) as output_file:
+                temp_files.append(output_file.name)
+                ffmpeg_command = [*FFMPEG, *input_options, '-c', 'copy', output_file.name]
+                await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
+                output_file_path = Path(output_file.name)
+                if await is_non_empty(output_file_path):
+                    await upload_file(
+                        event,
+                        output_file_path,
+                        progress_message,
+                        is_voice=message.voice is not None,
+                    )
+                    await status_message.edit(t('merge_completed'))
+                else:
+                    await status_message.edit(t('merge_failed'))
 
     finally:
         # Clean up temporary files
         with contextlib.suppress(OSError):
-            for path in temp_files:
-                Path(path).unlink(missing_ok=True)
-            Path(file_list.name).unlink(missing_ok=True)
-            Path(output_file.name).unlink(missing_ok=True)
+            await asyncio.to_thread(remove_files, *temp_files)
         merge_states.pop(event.sender_id)
 
 
 async def trim_silence(event: NewMessage.Event) -> None:
     reply_message = await get_reply_message(event, previous=True)
-    status_message = await event.reply(t('starting_silence_trimming'))
-    progress_message = await event.reply(f'<pre>{t('process_output')}:</pre>')
+    status_message, progress_message = await reply_with_progress(
+        event, t('starting_silence_trimming')
+    )
     extension = reply_message.file.ext
 
     with (
-        NamedTemporaryFile(suffix=extension) as input_file,
-        NamedTemporaryFile(suffix='.mp3') as output_file,
+        reserve_temp_dir(reply_message) as temp_dir,
+        NamedTemporaryFile(suffix=extension, dir=temp_dir) as input_file,
+        NamedTemporaryFile(suffix='.mp3', dir=temp_dir) as output_file,
     ):
         output_file_path = Path(output_file.name).parent / output_file.name
         if reply_message.file.name:
@@ -499,30 +835,23 @@ async def trim_silence(event: NewMessage.Event) -> None:
                 f'trimmed_{reply_message.file.name}'
             ).with_suffix('.mp3')
         await download_file(event, input_file, reply_message, progress_message)
-        await progress_message.edit(t('loading_file'))
-        sound = AudioSegment.from_file(Path(input_file.name))
-        await progress_message.edit(t('splitting'))
-        chunks = split_on_silence(sound, min_silence_len=500, silence_thresh=-40)
-        await progress_message.edit(t('combining'))
-        combined = AudioSegment.empty()
-        for chunk in chunks:
-            combined += chunk
-        await progress_message.edit(t('exporting'))
-        combined.export(output_file_path, format='mp3')
-        # command = (
-        #     f'ffmpeg -hide_banner -y -i "{input_file.name}" -af '
-        #     f'silenceremove=start_periods=1:start_duration=1:start_threshold=-50dB:'
-        #     f'detection=peak,aformat=dblp,areverse,silenceremove=start_periods=1:start_duration=1:'
-        #     f'start_threshold=-10dB:detection=peak,aformat=dblp,areverse "{output_file_path.name}"'
-        # )
-        # command = (
-        #     f'ffmpeg -hide_banner -y -i "{input_file.name}" -f wav - | sox -t wav - "{output_file_path.name}" '
-        #     f'silence -l 1 0.1 1% -1 1.0 1%'
-        # )
-        #
-        # await stream_shell_output(event, command, status_message, progress_message)
-
-        if not output_file_path.exists() or not output_file_path.stat().st_size:
+        # Drop leading silence and every pause of 0.5s or more under -40dB in one streaming pass,
+        # keeping a short gap between the remaining parts like pydub's split_on_silence did.
+        command = [
+            *FFMPEG,
+            '-i',
+            input_file.name,
+            '-vn',
+            '-af',
+            (
+                'silenceremove=start_periods=1:start_threshold=-40dB:start_silence=0.1:'
+                'stop_periods=-1:stop_duration=0.5:stop_threshold=-40dB:stop_silence=0.2'
+            ),
+            str(output_file_path),
+        ]
+        await stream_shell_output(event, command, status_message, progress_message)
+
+        if not await is_non_empty(output_file_path):
             await status_message.edit(t('silence_trimming_failed'))
             return
 
@@ -533,59 +862,77 @@ async def trim_silence(event: NewMessage.Event) -> None:
             is_voice=bool(reply_message.voice),
             caption=t('trimmed_audio'),
         )
+        await asyncio.to_thread(remove_files, output_file_path)
 
     await status_message.edit(t('silence_trimmed'))
 
 
 async def mute_video(event: NewMessage.Event) -> None:
-    ffmpeg_command = 'ffmpeg -hide_banner -y -i "{input}" -c copy -an "{output}"'
+    ffmpeg_command = [*FFMPEG, '-i', '{input}', '-c', 'copy', '-an', '{output}']
     await process_media(
         event,
         ffmpeg_command,
         '.mp4',
         feedback_text=t('audio_removed_from_video'),
+        stream_input=True,
     )
 
 
 async def extract_subtitle(event: NewMessage.Event) -> None:
     reply_message = await get_reply_message(event, previous=True)
-    status_message = await event.reply(t('starting_subtitle_extraction'))
-    progress_message = await event.reply(f'<pre>{t('process_output')}:</pre>')
+    status_message, progress_message = await reply_with_progress(
+        event, t('starting_subtitle_extraction')
+    )
 
-    with NamedTemporaryFile(suffix=reply_message.file.ext) as input_file:
+    with (
+        reserve_temp_dir(reply_message) as temp_dir,
+        NamedTemporaryFile(suffix=reply_message.file.ext, dir=temp_dir) as input_file,
+    ):
         await download_file(event, input_file, reply_message, progress_message)
 
-        output, code = await run_command(
-            f'ffprobe -v quiet -print_format json -show_streams "{input_file.name}"'
-        )
-        if code:
+        probe = await get_probe(reply_message, input_file.name)
+        if probe is None:
             await status_message.edit(t('failed_to_get_stream_info'))
             return
 
-        streams = orjson.loads(output)['streams']
+        streams = probe.get('streams', [])
         subtitle_streams = [s for s in streams if s['codec_type'] == 'subtitle']
 
         if not subtitle_streams:
             await status_message.edit(t('no_subtitle_streams'))
             return
 
-        for i, stream in enumerate(subtitle_streams):
-            ext = 'srt' if stream['codec_name'] == 'mov_text' else stream['codec_name']
-            output_file = Path(input_file.name).with_suffix(f'.{ext}')
-
-            ffmpeg_command = (
-                f'ffmpeg -hide_banner -y -i "{input_file.name}" '
-                f'-map 0:{stream["index"]} "{output_file}"'
+        input_path = Path(input_file.name)
+        output_files = [
+            input_path.with_name(
+                f'{input_path.stem}_{i + 1}'
+                f'.{SUBTITLE_EXTENSIONS.get(stream["codec_name"], DEFAULT_SUBTITLE_EXTENSION)}'
             )
-            await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
+            for i, stream in enumerate(subtitle_streams)
+        ]
+        # Extract all streams in a single pass over the input
+        # Text subtitles are copied as is, only mov_text has to be converted to srt
+        ffmpeg_command = [*FFMPEG, '-i', input_file.name]
+        for stream, output_file in zip(subtitle_streams, output_files, strict=True):
+            ffmpeg_command += [
+                '-map',
+                f'0:{stream["index"]}',
+                '-c:s',
+                'srt' if stream['codec_name'] == 'mov_text' else 'copy',
+                str(output_file),
+            ]
+        await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
 
-            if output_file.exists() and output_file.stat().st_size:
-                caption = f'Subtitle {i + 1}: {stream.get("tags", {}).get("language", "Unknown")}'
-                await event.client.send_file(event.chat_id, output_file, caption=caption)
+        # subtitle files are small, send them one by one to keep them in stream order
+        for i, (stream, output_file) in enumerate(zip(subtitle_streams, output_files, strict=True)):
+            if await is_non_empty(output_file):
+                language = stream.get('tags', {}).get('language', 'Unknown')
+                await event.client.send_file(
+                    event.chat_id, output_file, caption=f'Subtitle {i + 1}: {language}'
+                )
             else:
                 await status_message.edit(t('failed_to_extract_subtitle_stream', stream=i + 1))
-
-            output_file.unlink(missing_ok=True)
+            await asyncio.to_thread(remove_files, output_file)
 
     await status_message.edit(t('subtitle_extraction_completed'))
 
@@ -609,6 +956,8 @@ ALLOWED_AUDIO_FORMATS = {
     'mpeg',
 }
 ALLOWED_VIDEO_FORMATS = {'mp4', 'mkv', 'avi', 'mov', 'webm', 'flv', 'mpeg', 'mpg', 'wmv', 'm4v'}
+ALLOWED_FORMATS = frozenset(ALLOWED_AUDIO_FORMATS | ALLOWED_VIDEO_FORMATS)
+ALLOWED_FORMATS_TEXT = ', '.join(sorted(ALLOWED_FORMATS))
 
 
 async def convert_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
@@ -631,13 +980,13 @@ async def convert_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
             await event.edit(f'{t('choose_target_format')}:', buttons=buttons)
             return
     else:
-        target_format = event.message.text.split('convert ')[1].lower()
+        target_format = event.message.text.partition('convert ')[2].lower()
         if target_format[0] == '.':
             target_format = target_format[1:]
-        if target_format not in ALLOWED_VIDEO_FORMATS | ALLOWED_AUDIO_FORMATS:
+        if target_format not in ALLOWED_FORMATS:
             await event.reply(
                 f'{t('unsupported_media_type')}.\n'
-                f'{t('allowed_formats')}: {", ".join(ALLOWED_VIDEO_FORMATS | ALLOWED_AUDIO_FORMATS)}'
+                f'{t('allowed_formats')}: {ALLOWED_FORMATS_TEXT}'
             )
             return
     reply_message = await get_reply_message(event, previous=True)
@@ -646,12 +995,22 @@ async def convert_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
         return
 
     if target_format in ALLOWED_AUDIO_FORMATS:
-        ffmpeg_command = 'ffmpeg -hide_banner -y -i "{input}" -b:a {audio_bitrate} "{output}"'
+        ffmpeg_command = [*FFMPEG, '-i', '{input}', '-b:a', '{audio_bitrate}', '{output}']
     else:
-        ffmpeg_command = (
-            'ffmpeg -hide_banner -y -i "{input}" -c:v libx264 -b:v {video_bitrate} '
-            '-c:a aac -b:a {audio_bitrate} "{output}"'
-        )
+        ffmpeg_command = [
+            *FFMPEG,
+            *await get_hwaccel_options(),
+            '-i',
+            '{input}',
+            *await get_h264_encoder(),
+            '-b:v',
+            '{video_bitrate}',
+            '-c:a',
+            'aac',
+            '-b:a',
+            '{audio_bitrate}',
+            '{output}',
+        ]
 
     await process_media(
         event,
@@ -666,6 +1025,8 @@ async def convert_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
 
 
 ALLOWED_VIDEO_QUALITIES = {144, 240, 360, 480, 720}
+ALLOWED_VIDEO_QUALITIES_TEXT = ', '.join(map(str, sorted(ALLOWED_VIDEO_QUALITIES)))
+ALLOWED_VIDEO_QUALITIES_ALTERNATION = '|'.join(map(str, sorted(ALLOWED_VIDEO_QUALITIES)))
 
 
 async def resize_video(event: NewMessage.Event | CallbackQuery.Event) -> None:
@@ -684,22 +1045,37 @@ async def resize_video(event: NewMessage.Event | CallbackQuery.Event) -> None:
             await event.edit(f'{t('choose_target_quality')}:', buttons=buttons)
             return
     else:
-        quality = event.message.text.split('resize ')[1]
+        quality = event.message.text.partition('resize ')[2]
 
     quality = int(quality)
     if quality not in ALLOWED_VIDEO_QUALITIES:
         await event.reply(
-            f'{t('invalid_target_quality')}. {t('please_choose_from')} {", ".join(map(str, ALLOWED_VIDEO_QUALITIES))}.'
+            f'{t('invalid_target_quality')}. {t('please_choose_from')} {ALLOWED_VIDEO_QUALITIES_TEXT}.'
         )
         return
 
     reply_message = await get_reply_message(event, previous=True)
-    ffmpeg_command = (
-        f'ffmpeg -hide_banner -y -i "{{input}}" -filter_complex '
-        f'"scale=width=-1:height={quality}:force_original_aspect_ratio=decrease,pad=ceil(iw/2)*2:ceil(ih/2)*2" '
-        f'-c:v libx264 -b:v {{video_bitrate}} -maxrate {{video_bitrate}} -bufsize {{video_bitrate}} '
-        f'-c:a copy "{{output}}"'
-    )
+    ffmpeg_command = [
+        *FFMPEG,
+        *await get_hwaccel_options(keep_frames_on_device=False),
+        '-i',
+        '{input}',
+        '-filter_complex',
+        (
+            f'scale=width=-1:height={quality}:force_original_aspect_ratio=decrease,'
+            'pad=ceil(iw/2)*2:ceil(ih/2)*2'
+        ),
+        *await get_h264_encoder(),
+        '-b:v',
+        '{video_bitrate}',
+        '-maxrate',
+        '{video_bitrate}',
+        '-bufsize',
+        '{video_bitrate}',
+        '-c:a',
+        'copy',
+        '{output}',
+    ]
     await process_media(
         event, ffmpeg_command, reply_message.file.ext, reply_message=reply_message, get_bitrate=True
     )
@@ -708,40 +1084,54 @@ async def resize_video(event: NewMessage.Event | CallbackQuery.Event) -> None:
 
 
 async def video_update_initial(event: NewMessage.Event | CallbackQuery.Event) -> None:
-    video_update_states[event.sender_id]['state'] = MergeState.COLLECTING
-    video_update_states[event.sender_id]['files'] = []
+    video_update_states[event.sender_id] = UserMergeState(MergeState.COLLECTING)
     reply_message = await get_reply_message(event, previous=True)
-    video_update_states[event.sender_id]['files'].append(reply_message.id)
+    video_update_states[event.sender_id].files.append(reply_message.id)
     await event.reply(t('send_media_to_use'), reply_to=reply_message.id)
 
 
 async def video_update_process(event: NewMessage.Event) -> None:
-    video_update_states[event.sender_id]['state'] = MergeState.MERGING
+    video_update_states[event.sender_id].state = MergeState.MERGING
     video_message = await event.client.get_messages(
-        event.chat_id, ids=video_update_states[event.sender_id]['files'][0]
+        event.chat_id, ids=video_update_states[event.sender_id].files[0]
     )
     audio_message = event.message
-    status_message = await event.reply(t('starting_audio_update'))
-    progress_message = await event.respond(f'<pre>{t('process_output')}:</pre>')
+    status_message, progress_message = await asyncio.gather(
+        event.reply(t('starting_audio_update')), event.respond(f'<pre>{t('process_output')}:</pre>')
+    )
 
     with (
-        NamedTemporaryFile(suffix=video_message.file.ext) as video_file,
-        NamedTemporaryFile(suffix=audio_message.file.ext) as audio_file,
-        NamedTemporaryFile(suffix=video_message.file.ext) as output_file,
+        reserve_temp_dir(video_message, audio_message) as temp_dir,
+        NamedTemporaryFile(suffix=video_message.file.ext, dir=temp_dir) as video_file,
+        NamedTemporaryFile(suffix=audio_message.file.ext, dir=temp_dir) as audio_file,
+        NamedTemporaryFile(suffix=video_message.file.ext, dir=temp_dir) as output_file,
     ):
         await download_file(event, video_file, video_message, progress_message)
         await download_file(event, audio_file, audio_message, progress_message)
 
-        ffmpeg_command = (
-            f'ffmpeg -hide_banner -y -i "{video_file.name}" -i "{audio_file.name}" '
-            f'-map "0:v" -map "1:a" -c:v copy -c:a copy "{output_file.name}"'
-        )
+        ffmpeg_command = [
+            *FFMPEG,
+            '-i',
+            video_file.name,
+            '-i',
+            audio_file.name,
+            '-map',
+            '0:v',
+            '-map',
+            '1:a',
+            '-c:v',
+            'copy',
+            '-c:a',
+            'copy',
+            output_file.name,
+        ]
         await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
-        if not Path(output_file.name).exists() or not Path(output_file.name).stat().st_size:
+        output_file_path = Path(output_file.name)
+        if not await is_non_empty(output_file_path):
             await status_message.edit(t('audio_update_failed'))
             return
 
-        await upload_file(event, Path(output_file.name), progress_message)
+        await upload_file(event, output_file_path, progress_message)
 
     await status_message.edit(t('video_audio_updated'))
     video_update_states.pop(event.sender_id)
@@ -768,7 +1158,7 @@ async def amplify_sound(event: NewMessage.Event | CallbackQuery.Event) -> None:
             await event.edit(f'{t("choose_amplification_factor")}:', buttons=buttons)
             return
     else:
-        amplification_factor = float(event.message.text.split('amplify ')[1])
+        amplification_factor = float(event.message.text.partition('amplify ')[2])
 
     if amplification_factor <= 1:
         await event.reply(t('amplification_factor_must_be_greater_than_1'))
@@ -776,17 +1166,21 @@ async def amplify_sound(event: NewMessage.Event | CallbackQuery.Event) -> None:
     amplification_factor = min(amplification_factor, 3)
 
     reply_message = await get_reply_message(event, previous=True)
-    ffmpeg_command = (
-        'ffmpeg -hide_banner -y -i "{input}" '
-        f'-filter:a "volume={amplification_factor}" '
-        '-b:a {audio_bitrate}'
-    )
+    ffmpeg_command = [
+        *FFMPEG,
+        '-i',
+        '{input}',
+        '-filter:a',
+        f'volume={amplification_factor}',
+        '-b:a',
+        '{audio_bitrate}',
+    ]
 
     if bool(reply_message.video or reply_message.video_note):
-        ffmpeg_command += ' -c:v copy'
+        ffmpeg_command += ['-c:v', 'copy']
     else:
-        ffmpeg_command += ' -vn'
-    ffmpeg_command += ' "{output}"'
+        ffmpeg_command.append('-vn')
+    ffmpeg_command.append('{output}')
 
     await process_media(
         event,
@@ -804,35 +1198,61 @@ async def amplify_sound(event: NewMessage.Event | CallbackQuery.Event) -> None:
 
 async def video_thumbnails(event: NewMessage.Event | CallbackQuery.Event) -> None:
     reply_message = await get_reply_message(event, previous=True)
-    status_message = await event.reply(t('starting_thumbnail_generation'))
-    progress_message = await event.reply(f'<pre>{t('process_output')}:</pre>')
+    status_message, progress_message = await reply_with_progress(
+        event, t('starting_thumbnail_generation')
+    )
 
-    with NamedTemporaryFile(suffix=reply_message.file.ext) as input_file:
+    with (
+        reserve_temp_dir(reply_message) as temp_dir,
+        NamedTemporaryFile(suffix=reply_message.file.ext, dir=temp_dir) as input_file,
+    ):
         await download_file(event, input_file, reply_message, progress_message)
-        duration_output, _ = await run_command(
-            f'ffprobe -v error -show_entries format=duration -of '
-            f'default=noprint_wrappers=1:nokey=1 "{input_file.name}"'
-        )
-        duration = float(duration_output.strip())
+        probe = await get_probe(reply_message, input_file.name) or {}
+        duration = float(probe.get('format', {}).get('duration', 0))
 
-        # Calculate timestamps for each thumbnail
-        interval = duration / 16
-        timestamps = [i * interval for i in range(16)]
-        # Generate thumbnail grid
+        # Seek to each timestamp and grab a single frame instead of decoding the whole video
         output_file = Path(input_file.name).with_suffix('.jpg')
-        select_frames = '+'.join([f'eq(n,{int(i * 25)})' for i in timestamps])  # Assuming 25 fps
-        ffmpeg_command = (
-            f'ffmpeg -hide_banner -y -i "{input_file.name}" '
-            f'-vf "select=\'{select_frames}\',scale=480:-1,tile=4x4" '
-            f'-frames:v 1 "{output_file}"'
+        thumbnails_pattern = output_file.with_name(f'{output_file.stem}_%03d.jpg')
+        thumbnails = [Path(str(thumbnails_pattern) % idx) for idx in range(16)]
+        await asyncio.gather(
+            *[
+                run_command(
+                    [
+                        *FFMPEG,
+                        '-ss',
+                        f'{idx * duration / 16:.3f}',
+                        '-i',
+                        input_file.name,
+                        '-frames:v',
+                        '1',
+                        str(thumbnail),
+                    ]
+                )
+                for idx, thumbnail in enumerate(thumbnails)
+            ]
         )
+        # Generate thumbnail grid
+        ffmpeg_command = [
+            *FFMPEG,
+            '-i',
+            str(thumbnails_pattern),
+            '-vf',
+            'scale=480:-1,tile=4x4',
+            '-frames:v',
+            '1',
+            str(output_file),
+        ]
 
         await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
-        if not output_file.exists() or not output_file.stat().st_size:
-            await status_message.edit(t('thumbnail_generation_failed'))
-            return
-        await upload_file(event, output_file, progress_message)
-        await upload_file(event, output_file, progress_message, force_document=True)
+        await asyncio.to_thread(remove_files, *thumbnails)
+        try:
+            if not await is_non_empty(output_file):
+                await status_message.edit(t('thumbnail_generation_failed'))
+                return
+            await upload_file(event, output_file, progress_message)
+            await upload_file(event, output_file, progress_message, force_document=True)
+        finally:
+            await asyncio.to_thread(remove_files, output_file)
 
     await status_message.edit(t('video_thumbnails_generated'))
 
@@ -857,7 +1277,7 @@ async def compress_video(event: NewMessage.Event | CallbackQuery.Event) -> None:
             await event.edit(f'{t('choose_target_compression_percentage')}:', buttons=buttons)
             return
     else:
-        target_percentage = int(event.message.text.split('compress ')[1])
+        target_percentage = int(event.message.text.partition('compress ')[2])
 
     if target_percentage < 20 or target_percentage > 90:
         await event.reply(t('compression_percentage_must_be_between_20_and_90'))
@@ -873,16 +1293,32 @@ async def compress_video(event: NewMessage.Event | CallbackQuery.Event) -> None:
         if target_bitrate // 1000000 >= 1
         else f'{target_bitrate // 1000}k'
     )
-    ffmpeg_command = (
-        f'ffmpeg -hide_banner -y -i "{{input}}" '
-        f'-c:v libx264 -b:v {bitrate} -bufsize {bitrate} '
-        '-preset ultrafast '
-        '-c:a aac -b:a 48k '
-        '-movflags +faststart '
-        f'"{{output}}"'
-    )
+    ffmpeg_command = [
+        *FFMPEG,
+        '-i',
+        '{input}',
+        '-c:v',
+        'libx264',
+        '-b:v',
+        bitrate,
+        '-bufsize',
+        bitrate,
+        '-preset',
+        'ultrafast',
+        '-c:a',
+        'aac',
+        '-b:a',
+        '48k',
+        '-movflags',
+        '+faststart',
+        '{output}',
+    ]
     data = await process_media(
-        event, ffmpeg_command, reply_message.file.ext, feedback_text=t('video_compressed')
+        event,
+        ffmpeg_command,
+        reply_message.file.ext,
+        feedback_text=t('video_compressed'),
+        stream_input=True,
     )
     compression_ratio = (1 - (data['output_size'] / reply_message.file.size)) * 100
     feedback_text = (
@@ -917,18 +1353,30 @@ async def video_encode_x265(event: NewMessage.Event | CallbackQuery.Event) -> No
         return
 
     reply_message = await get_reply_message(event, previous=True)
-    ffmpeg_command = (
-        'ffmpeg -hide_banner -y -i "{input}" '
-        f'-c:v libx265 -crf {crf} -preset ultrafast '
-        '-c:a aac -b:a 48k '
-        '-movflags +faststart '
-        '"{output}"'
-    )
+    ffmpeg_command = [
+        *FFMPEG,
+        '-i',
+        '{input}',
+        '-c:v',
+        'libx265',
+        '-crf',
+        str(crf),
+        '-preset',
+        'ultrafast',
+        '-c:a',
+        'aac',
+        '-b:a',
+        '48k',
+        '-movflags',
+        '+faststart',
+        '{output}',
+    ]
     data = await process_media(
         event,
         ffmpeg_command,
         reply_message.file.ext,
         feedback_text=t('video_x265_encoded'),
+        stream_input=True,
     )
 
     compression_ratio = (1 - (data['output_size'] / reply_message.file.size)) * 100
@@ -941,21 +1389,24 @@ async def video_encode_x265(event: NewMessage.Event | CallbackQuery.Event) -> No
 
 
 async def video_create_initial(event: NewMessage.Event | CallbackQuery.Event) -> None:
-    video_create_states[event.sender_id]['state'] = MergeState.COLLECTING
-    video_create_states[event.sender_id]['files'] = []
+    video_create_states[event.sender_id] = UserMergeState(MergeState.COLLECTING)
     reply_message = await get_reply_message(event, previous=True)
-    video_create_states[event.sender_id]['files'].append(reply_message.id)
+    video_create_states[event.sender_id].files.append(reply_message.id)
     await event.reply(t('send_subtitle_or_photo'), reply_to=reply_message.id)
 
 
 async def video_create_process(event: NewMessage.Event) -> None:
-    video_create_states[event.sender_id]['state'] = MergeState.MERGING
+    video_create_states[event.sender_id].state = MergeState.MERGING
     audio_message: Message = await event.client.get_messages(
-        event.chat_id, ids=video_create_states[event.sender_id]['files'][0]
+        event.chat_id, ids=video_create_states[event.sender_id].files[0]
     )
     input_message: Message = event.message
-    status_message: Message = await event.reply(t('starting_video_creation'))
-    progress_message: Message = await event.respond(f'<pre>{t('process_output')}:</pre>')
+    status_message: Message
+    progress_message: Message
+    status_message, progress_message = await asyncio.gather(
+        event.reply(t('starting_video_creation')),
+        event.respond(f'<pre>{t('process_output')}:</pre>'),
+    )
 
     audio_file = Path(TMP_DIR / audio_message.file.name)
     input_file = Path(
@@ -968,37 +1419,77 @@ async def video_create_process(event: NewMessage.Event) -> None:
         await download_file(event, f, input_message, progress_message)
 
     if input_message.file.ext == '.srt':
-        ffmpeg_command = (
-            f'ffmpeg -hide_banner -y -f lavfi -i color=c=black:s=854x480:d={audio_message.file.duration} '
-            f'-i "{audio_file.name}" -i "{input_file.name}" '
-            f"-filter_complex \"[0:v]subtitles=f='{input_file.name}':force_style='FontSize=28,Alignment=10,MarginV=190'[v]\" "
-            f'-map "[v]" -map 1:a -map 2 '
-            f'-c:v libx264 -preset ultrafast -c:a aac -b:a 48k '
-            f'-c:s mov_text '
-            f'-shortest "{output_file.name}"'
-        )
+        ffmpeg_command = [
+            *FFMPEG,
+            '-f',
+            'lavfi',
+            '-i',
+            f'color=c=black:s=854x480:d={audio_message.file.duration}',
+            '-i',
+            audio_file.name,
+            '-i',
+            input_file.name,
+            '-filter_complex',
+            (
+                f"[0:v]subtitles=f='{input_file.name}':"
+                "force_style='FontSize=28,Alignment=10,MarginV=190'[v]"
+            ),
+            '-map',
+            '[v]',
+            '-map',
+            '1:a',
+            '-map',
+            '2',
+            '-c:v',
+            'libx264',
+            '-preset',
+            'ultrafast',
+            '-c:a',
+            'aac',
+            '-b:a',
+            '48k',
+            '-c:s',
+            'mov_text',
+            '-shortest',
+            output_file.name,
+        ]
     elif input_message.photo:
-        ffmpeg_command = (
-            f'ffmpeg -hide_banner -y -loop 1 -i "{input_file.name}" '
-            f'-i "{audio_file.name}" '
-            f'-c:v libx264 -preset ultrafast -tune stillimage '
-            f'-c:a aac -b:a 48k -shortest '
-            f'-pix_fmt yuv420p "{output_file.name}"'
-        )
+        ffmpeg_command = [
+            *FFMPEG,
+            '-loop',
+            '1',
+            '-i',
+            input_file.name,
+            '-i',
+            audio_file.name,
+            '-c:v',
+            'libx264',
+            '-preset',
+            'ultrafast',
+            '-tune',
+            'stillimage',
+            '-c:a',
+            'aac',
+            '-b:a',
+            '48k',
+            '-shortest',
+            '-pix_fmt',
+            'yuv420p',
+            output_file.name,
+        ]
     else:
         await status_message.edit(t('unsupported_input_file_format'))
         raise StopPropagation
 
     await stream_shell_output(event, ffmpeg_command, status_message, progress_message)
-    if not output_file.exists() or not output_file.stat().st_size:
+    if not await is_non_empty(output_file):
         await status_message.edit(t('video_creation_failed'))
     else:
         await upload_file(event, output_file, progress_message)
         await status_message.edit(t('video_created'))
-        output_file.unlink(missing_ok=True)
+        await asyncio.to_thread(remove_files, output_file)
 
-    audio_file.unlink(missing_ok=True)
-    input_file.unlink(missing_ok=True)
+    await asyncio.to_thread(remove_files, audio_file, input_file)
     video_create_states.pop(event.sender_id)
     raise StopPropagation
 
@@ -1037,8 +1528,7 @@ async def transcribe_media(event: NewMessage.Event | CallbackQuery.Event) -> Non
             return
 
     reply_message = await get_reply_message(event, previous=True)
-    status_message = await event.reply(t('starting_transcription'))
-    progress_message = await event.reply(f'<pre>{t('process_output')}:</pre>')
+    status_message, progress_message = await reply_with_progress(event, t('starting_transcription'))
     output_dir = Path(TMP_DIR / str(uuid4()))
     output_dir.mkdir(parents=True, exist_ok=True)
 
@@ -1060,8 +1550,8 @@ async def transcribe_media(event: NewMessage.Event | CallbackQuery.Event) -> Non
         await stream_shell_output(event, command, status_message, progress_message, max_length=100)
         if transcription_method == 'vosk':
             srt_to_txt(tmp_file_path.with_suffix('.srt'))
-        for output_file in output_dir.glob('*.[st][xr]t'):
-            if output_file.exists() and output_file.stat().st_size:
+        for output_file in await asyncio.to_thread(list, output_dir.glob('*.[st][xr]t')):
+            if await is_non_empty(output_file):
                 if reply_message.file.name:
                     renamed_file = output_file.with_stem(Path(reply_message.file.name).stem)
                     output_file.rename(renamed_file)
@@ -1076,7 +1566,7 @@ async def transcribe_media(event: NewMessage.Event | CallbackQuery.Event) -> Non
             else:
                 await status_message.edit(f'{t('failed_to_transcribe')} {renamed_file.name}')
     await status_message.edit(t('transcription_completed'))
-    rmtree(output_dir)
+    await asyncio.to_thread(rmtree, output_dir)
     await delete_message_after(progress_message)
     if delete_message_after_process:
         event.client.loop.create_task(delete_message_after(await event.get_message()))
@@ -1098,15 +1588,21 @@ async def fix_stereo_audio(event: NewMessage.Event | CallbackQuery.Event) -> Non
             await event.edit(f'{t('use_audio_of_which_channel')}:', buttons=buttons)
             return
     else:
-        channel = event.message.text.split('stereo ')[1]
+        channel = event.message.text.partition('stereo ')[2]
     reply_message = await get_reply_message(event, previous=True)
     channel = 'FR' if channel == 'right' else 'FL'
-    ffmpeg_command = (
-        f'ffmpeg -hide_banner -y -i "{{input}}" '
-        f'-af "pan=mono|c0={channel}" '
-        f'-c:a aac -b:a {{audio_bitrate}} '
-        f'"{{output}}"'
-    )
+    ffmpeg_command = [
+        *FFMPEG,
+        '-i',
+        '{input}',
+        '-af',
+        f'pan=mono|c0={channel}',
+        '-c:a',
+        'aac',
+        '-b:a',
+        '{audio_bitrate}',
+        '{output}',
+    ]
     await process_media(
         event, ffmpeg_command, reply_message.file.ext, reply_message=reply_message, get_bitrate=True
     )
@@ -1114,220 +1610,113 @@ async def fix_stereo_audio(event: NewMessage.Event | CallbackQuery.Event) -> Non
         event.client.loop.create_task(delete_message_after(await event.get_message()))
 
 
-handlers: CommandHandlerDict = {
-    'audio compress': compress_audio,
-    'audio convert': convert_to_audio,
-    'audio metadata': set_metadata,
-    'audio trim': trim_silence,
-    'media amplify': amplify_sound,
-    'media convert': convert_media,
-    'media cut': cut_media,
-    'media info': media_info,
-    'media merge': merge_media_initial,
-    'media split': split_media,
-    'media stereo': fix_stereo_audio,
-    'transcribe': transcribe_media,
-    'video compress': compress_video,
-    'video create': video_create_initial,
-    'video mute': mute_video,
-    'video resize': resize_video,
-    'video subtitle': extract_subtitle,
-    'video thumbnails': video_thumbnails,
-    'video update': video_update_initial,
-    'video x265': video_encode_x265,
-    'voice': convert_to_voice_note,
-}
+handlers: CommandHandlerDict = MappingProxyType(
+    {
+        'audio compress': compress_audio,
+        'audio convert': convert_to_audio,
+        'audio metadata': set_metadata,
+        'audio trim': trim_silence,
+        'media amplify': amplify_sound,
+        'media convert': convert_media,
+        'media cut': cut_media,
+        'media info': media_info,
+        'media merge': merge_media_initial,
+        'media split': split_media,
+        'media stereo': fix_stereo_audio,
+        'transcribe': transcribe_media,
+        'video compress': compress_video,
+        'video create': video_create_initial,
+        'video mute': mute_video,
+        'video resize': resize_video,
+        'video subtitle': extract_subtitle,
+        'video thumbnails': video_thumbnails,
+        'video update': video_update_initial,
+        'video x265': video_encode_x265,
+        'voice': convert_to_voice_note,
+    }
+)
+
+handler = partial(dynamic_handler, get_pattern_handlers(handlers), get_callback_handlers(handlers))
+
+# Handlers of replies to the bot's questions, picked by the format of the answer
+reply_routes = (
+    (CUT_POINTS_MESSAGE_PATTERN, cut_media),
+    (SPLIT_DURATION_PATTERN, split_media),
+    (METADATA_PATTERN, set_metadata),
+)
+
+
+async def handle_reply_state(event: NewMessage.Event) -> None:
+    for pattern, route in reply_routes:
+        if pattern.match(event.message.text):
+            await route(event)
+            return
+
 
-handler = partial(dynamic_handler, handlers)
+# (command, pattern, condition)
+MEDIA_COMMANDS = (
+    ('audio compress', r'^/(audio)\s+(compress)\s+(\d+)$', has_audio),
+    ('audio convert', r'^/(audio)\s+(convert)$', has_no_audio),
+    ('audio metadata', r'^/(audio)\s+(metadata)\s+.+\s+-\s+.+$', has_audio),
+    ('audio trim', r'^/(audio)\s+(trim)$', has_audio_or_voice),
+    ('media amplify', r'^/(media)\s+(amplify)\s+(\d+(\.\d+)?)$', has_any_media),
+    ('media convert', r'^/(media)\s+(convert)\s+(\w+)$', has_any_media),
+    (
+        'media cut',
+        (
+            r'^/(media)\s+(cut)\s+(\d{2}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2}'
+            r'(\s+\d{2}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2})*)$'
+        ),
+        has_any_media,
+    ),
+    ('media split', r'^/(media)\s+(split)\s+(\d+[hms])$', has_any_media),
+    ('media merge', r'^/(media)\s+(merge)$', has_any_media),
+    ('media info', r'^/(media)\s+(info)$', has_any_media),
+    ('media stereo', r'^/(media)\s+(stereo)\s+(right|left)$', has_audio_or_voice),
+    ('transcribe', r'^/(transcribe)(?:\s+(wit|whisper|vosk))?$', has_any_media),
+    ('video create', r'^/(video)\s+(create)$', has_audio_or_voice),
+    ('video compress', r'^/(video)\s+(compress)\s+(\d{1,2})$', has_video),
+    ('video mute', r'^/(video)\s+(mute)$', has_video_or_video_note),
+    (
+        'video resize',
+        rf'^/(video)\s+(resize)\s+({ALLOWED_VIDEO_QUALITIES_ALTERNATION})$',
+        has_video,
+    ),
+    ('video subtitle', r'^/(video)\s+(subtitle)$', has_video),
+    ('video thumbnails', r'^/(video)\s+(thumbnails)$', has_video),
+    ('video update', r'^/(video)\s+(update)$', has_video),
+    ('video x265', r'^/(video)\s+(x265)\s+(\d{2})$', has_video),
+    ('voice', r'^/(voice)$', has_no_voice),
+)
 
 
 class Media(ModuleBase):
     name = 'Media'
     description = t('_media_module_description')
-    commands: ClassVar[ModuleBase.CommandsT] = {
-        'audio compress': Command(
-            name='audio compress',
-            handler=handler,
-            description=t('_audio_compress_description'),
-            pattern=re.compile(r'^/(audio)\s+(compress)\s+(\d+)$'),
-            condition=partial(has_media, audio=True),
-            is_applicable_for_reply=True,
-        ),
-        'audio convert': Command(
-            name='audio convert',
-            handler=handler,
-            description=t('_audio_convert_description'),
-            pattern=re.compile(r'^/(audio)\s+(convert)$'),
-            condition=partial(has_media, not_audio=True),
-            is_applicable_for_reply=True,
-        ),
-        'audio metadata': Command(
-            name='audio metadata',
-            handler=handler,
-            description=t('_audio_metadata_description'),
-            pattern=re.compile(r'^/(audio)\s+(metadata)\s+.+\s+-\s+.+$'),
-            condition=partial(has_media, audio=True),
-            is_applicable_for_reply=True,
-        ),
-        'audio trim': Command(
-            name='audio trim',
-            handler=handler,
-            description=t('_audio_trim_description'),
-            pattern=re.compile(r'^/(audio)\s+(trim)$'),
-            condition=partial(has_media, audio_or_voice=True),
-            is_applicable_for_reply=True,
-        ),
-        'media amplify': Command(
-            name='audio amplify',
-            handler=handler,
-            description=t('_media_amplify_description'),
-            pattern=re.compile(r'^/(media)\s+(amplify)\s+(\d+(\.\d+)?)$'),
-            condition=partial(has_media, any=True),
-            is_applicable_for_reply=True,
-        ),
-        'media convert': Command(
-            name='media convert',
-            handler=handler,
-            description=t('_media_convert_description'),
-            pattern=re.compile(r'^/(media)\s+(convert)\s+(\w+)$'),
-            condition=partial(has_media, any=True),
-            is_applicable_for_reply=True,
-        ),
-        'media cut': Command(
-            name='media cut',
-            handler=handler,
-            description=t('_media_cut_description'),
-            pattern=re.compile(
-                r'^/(media)\s+(cut)\s+(\d{2}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2}'
-                r'(\s+\d{2}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2})*)$'
-            ),
-            condition=partial(has_media, any=True),
-            is_applicable_for_reply=True,
-        ),
-        'media split': Command(
-            name='media split',
-            handler=handler,
-            description=t('_media_split_description'),
-            pattern=re.compile(r'^/(media)\s+(split)\s+(\d+[hms])$'),
-            condition=partial(has_media, any=True),
-            is_applicable_for_reply=True,
-        ),
-        'media merge': Command(
-            name='media merge',
-            handler=handler,
-            description=t('_media_merge_description'),
-            pattern=re.compile(r'^/(media)\s+(merge)$'),
-            condition=partial(has_media, any=True),
-            is_applicable_for_reply=True,
-        ),
-        'media info': Command(
-            name='media info',
-            handler=handler,
-            description=t('_media_info_description'),
-            pattern=re.compile(r'^/(media)\s+(info)$'),
-            condition=partial(has_media, any=True),
-            is_applicable_for_reply=True,
-        ),
-        'media stereo': Command(
-            name='media stereo',
-            handler=handler,
-            description=t('_media_stereo_description'),
-            pattern=re.compile(r'^/(media)\s+(stereo)\s+(right|left)$'),
-            condition=partial(has_media, audio_or_voice=True),
-            is_applicable_for_reply=True,
-        ),
-        'transcribe': Command(
-            name='transcribe',
-            handler=handler,
-            description=t('_transcribe_description'),
-            pattern=re.compile(r'^/(transcribe)(?:\s+(wit|whisper|vosk))?$'),
-            condition=partial(has_media, any=True),
-            is_applicable_for_reply=True,
-        ),
-        'video create': Command(
-            name='video create',
-            handler=handler,
-            description=t('_video_create_description'),
-            pattern=re.compile(r'^/(video)\s+(create)$'),
-            condition=partial(has_media, audio_or_voice=True),
-            is_applicable_for_reply=True,
-        ),
-        'video compress': Command(
-            name='video compress',
-            handler=handler,
-            description=t('_video_compress_description'),
-            pattern=re.compile(r'^/(video)\s+(compress)\s+(\d{1,2})$'),
-            condition=partial(has_media, video=True),
-            is_applicable_for_reply=True,
-        ),
-        'video mute': Command(
-            name='video mute',
-            handler=handler,
-            description=t('_video_mute_description'),
-            pattern=re.compile(r'^/(video)\s+(mute)$'),
-            condition=partial(has_media, video_or_video_note=True),
-            is_applicable_for_reply=True,
-        ),
-        'video resize': Command(
-            name='video resize',
-            handler=handler,
-            description=t('_video_resize_description'),
-            pattern=re.compile(
-                rf'^/(video)\s+(resize)\s+({'|'.join(map(str, ALLOWED_VIDEO_QUALITIES))})$'
-            ),
-            condition=partial(has_media, video=True),
-            is_applicable_for_reply=True,
-        ),
-        'video subtitle': Command(
-            name='video subtitle',
-            handler=handler,
-            description=t('_video_subtitle_description'),
-            pattern=re.compile(r'^/(video)\s+(subtitle)$'),
-            condition=partial(has_media, video=True),
-            is_applicable_for_reply=True,
-        ),
-        'video thumbnails': Command(
-            name='video thumbnails',
-            handler=handler,
-            description=t('_video_thumbnails_description'),
-            pattern=re.compile(r'^/(video)\s+(thumbnails)$'),
-            condition=partial(has_media, video=True),
-            is_applicable_for_reply=True,
-        ),
-        'video update': Command(
-            name='video update',
-            handler=handler,
-            description=t('_video_update_description'),
-            pattern=re.compile(r'^/(video)\s+(update)$'),
-            condition=partial(has_media, video=True),
-            is_applicable_for_reply=True,
-        ),
-        'video x265': Command(
-            name='video x265',
-            handler=handler,
-            description=t('_video_x265_description'),
-            pattern=re.compile(r'^/(video)\s+(x265)\s+(\d{2})$'),
-            condition=partial(has_media, video=True),
-            is_applicable_for_reply=True,
-        ),
-        'voice': Command(
-            name='voice',
-            handler=convert_to_voice_note,
-            description=t('_voice_description'),
-            pattern=re.compile(r'^/(voice)$'),
-            condition=partial(has_media, not_voice=True),
-            is_applicable_for_reply=True,
-        ),
-    }
+    commands: ClassVar[ModuleBase.CommandsT] = MappingProxyType(
+        {
+            command: Command(
+                name=command,
+                handler=handler,
+                description=t(f'_{command.replace(" ", "_")}_description'),
+                pattern=re.compile(pattern),
+                condition=condition,
+                is_applicable_for_reply=True,
+            )
+            for command, pattern, condition in MEDIA_COMMANDS
+        }
+    )
 
     @staticmethod
     def register_handlers(bot: TelegramClient) -> None:
+        bot.loop.create_task(
+            sweep_merge_states(merge_states, video_create_states, video_update_states)
+        )
         bot.add_event_handler(
             merge_media_add,
             NewMessage(
                 func=lambda e: (
-                    (e.message.audio or e.message.voice)
-                    and merge_states[e.sender_id]['state'] == MergeState.COLLECTING
+                    is_collecting(e, merge_states) and (e.message.audio or e.message.voice)
                 )
             ),
         )
@@ -1335,46 +1724,17 @@ class Media(ModuleBase):
             merge_media_process,
             CallbackQuery(
                 pattern=b'finish_merge',
-                func=lambda e: merge_states[e.sender_id]['state'] == MergeState.COLLECTING,
-            ),
-        )
-        bot.add_event_handler(
-            set_metadata,
-            NewMessage(
-                func=lambda e: (
-                    is_valid_reply_state(e, reply_states)
-                    and re.match(r'^.+\s+-\s+.+$', e.message.text)
-                )
-            ),
-        )
-        bot.add_event_handler(
-            split_media,
-            NewMessage(
-                func=lambda e: (
-                    is_valid_reply_state(e, reply_states)
-                    and re.match(r'^(\d+[hms])$', e.message.text)
-                )
+                func=lambda e: is_collecting(e, merge_states),
             ),
         )
         bot.add_event_handler(
-            cut_media,
-            NewMessage(
-                func=lambda e: (
-                    is_valid_reply_state(e, reply_states)
-                    and re.match(
-                        r'^(\d{2}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2}(\s+\d{2}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2})*)$',
-                        e.message.text,
-                    )
-                )
-            ),
+            handle_reply_state, NewMessage(func=lambda e: is_valid_reply_state(e, reply_states))
         )
         bot.add_event_handler(
             video_update_process,
             NewMessage(
                 func=lambda e: (
-                    e.sender_id in video_update_states
-                    and video_update_states[e.sender_id]['state'] == MergeState.COLLECTING
-                    and (e.audio or e.voice or e.video)
+                    is_collecting(e, video_update_states) and (e.audio or e.voice or e.video)
                 )
             ),
         )
@@ -1382,8 +1742,7 @@ class Media(ModuleBase):
             video_create_process,
             NewMessage(
                 func=lambda e: (
-                    e.sender_id in video_create_states
-                    and video_create_states[e.sender_id]['state'] == MergeState.COLLECTING
+                    is_collecting(e, video_create_states)
                     and (e.file.ext.lower() == '.srt' or e.photo)
                 )
             ),
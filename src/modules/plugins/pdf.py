@@ -1,3 +1,4 @@
+from asyncio import gather
 from collections import defaultdict
 from contextlib import suppress
 from functools import partial
@@ -6,6 +7,7 @@ from os import getenv
 from pathlib import Path
 from shutil import rmtree
 from tempfile import NamedTemporaryFile
+from types import MappingProxyType
 from typing import ClassVar
 from uuid import uuid4
 from zipfile import ZIP_DEFLATED, ZipFile
@@ -16,24 +18,41 @@ from telethon import Button, TelegramClient
 from telethon.events import CallbackQuery, NewMessage, StopPropagation
 
 from src import TMP_DIR
-from src.modules.base import CommandHandlerDict, ModuleBase, dynamic_handler
+from src.modules.base import (
+    CommandHandlerDict,
+    ModuleBase,
+    dynamic_handler,
+    get_callback_handlers,
+    get_pattern_handlers,
+)
 from src.modules.plugins.run import stream_shell_output
 from src.utils.command import Command
 from src.utils.downloads import download_file, get_download_name, upload_file
-from src.utils.filters import has_pdf_file, has_photo_or_photo_file, is_valid_reply_state
+from src.utils.filters import (
+    has_pdf_file,
+    has_photo_or_photo_file,
+    is_collecting,
+    is_valid_reply_state,
+)
 from src.utils.i18n import t
 from src.utils.reply import (
     MergeState,
+    MergeStateT,
     ReplyState,
     StateT,
+    UserMergeState,
+    UserReplyState,
     handle_callback_query_for_reply_state,
+    sweep_merge_states,
 )
 from src.utils.telegram import delete_message_after, get_reply_message
 
-reply_states: StateT = defaultdict(
-    lambda: {'state': ReplyState.WAITING, 'media_message_id': None, 'reply_message_id': None}
-)
-merge_states: StateT = defaultdict(lambda: {'state': MergeState.IDLE, 'files': []})
+# Answers to the split pages count and pages to extract questions
+SPLIT_PAGES_COUNT_PATTERN = re.compile(r'^(\d+)$')
+PAGE_NUMBERS_PATTERN = re.compile(r'^[\d,\-\s]+$')
+
+reply_states: StateT = defaultdict(UserReplyState)
+merge_states: MergeStateT = {}
 
 
 async def extract_pdf_text(event: NewMessage.Event | CallbackQuery.Event) -> None:
@@ -58,31 +77,31 @@ async def extract_pdf_text(event: NewMessage.Event | CallbackQuery.Event) -> Non
 
 
 async def merge_pdf_initial(event: NewMessage.Event | CallbackQuery.Event) -> None:
-    merge_states[event.sender_id]['state'] = MergeState.COLLECTING
-    merge_states[event.sender_id]['files'] = []
+    merge_states[event.sender_id] = UserMergeState(MergeState.COLLECTING)
     reply_message = await get_reply_message(event, previous=True)
-    merge_states[event.sender_id]['files'].append(reply_message.id)
+    merge_states[event.sender_id].files.append(reply_message.id)
     await event.reply(t('send_more_pdf_files_to_merge'))
 
 
 async def merge_pdf_add(event: NewMessage.Event) -> None:
-    merge_states[event.sender_id]['files'].append(event.id)
+    merge_states[event.sender_id].files.append(event.id)
     await event.reply(t('file_added'), buttons=[Button.inline(t('finish'), 'finish_pdf_merge')])
     raise StopPropagation
 
 
 async def merge_pdf_process(event: CallbackQuery.Event) -> None:
-    merge_states[event.sender_id]['state'] = MergeState.MERGING
-    files = merge_states[event.sender_id]['files']
+    merge_states[event.sender_id].state = MergeState.MERGING
+    files = merge_states[event.sender_id].files
     await event.answer(t('merging'))
 
     if len(files) < 2:
         await event.answer(t('not_enough_files'))
-        merge_states[event.sender_id]['state'] = MergeState.IDLE
+        merge_states[event.sender_id].state = MergeState.IDLE
         return
 
-    status_message = await event.respond(t('starting_merge'))
-    progress_message = await event.respond(t('merging'))
+    status_message, progress_message = await gather(
+        event.respond(t('starting_merge')), event.respond(t('merging'))
+    )
 
     with pymupdf.open() as merged_pdf:
         for file_id in files:
@@ -127,9 +146,9 @@ async def split_pdf(event: NewMessage.Event | CallbackQuery.Event) -> None:
         )
 
     if event.sender_id in reply_states:
-        reply_states[event.sender_id]['state'] = ReplyState.PROCESSING
+        reply_states[event.sender_id].state = ReplyState.PROCESSING
         reply_message = await event.client.get_messages(
-            event.chat_id, ids=reply_states[event.sender_id]['media_message_id']
+            event.chat_id, ids=reply_states[event.sender_id].media_message_id
         )
     else:
         reply_message = await get_reply_message(event, previous=True)
@@ -193,9 +212,9 @@ async def extract_pdf_pages(event: NewMessage.Event | CallbackQuery.Event) -> No
         )
 
     if event.sender_id in reply_states:
-        reply_states[event.sender_id]['state'] = ReplyState.PROCESSING
+        reply_states[event.sender_id].state = ReplyState.PROCESSING
         reply_message = await event.client.get_messages(
-            event.chat_id, ids=reply_states[event.sender_id]['media_message_id']
+            event.chat_id, ids=reply_states[event.sender_id].media_message_id
         )
     else:
         reply_message = await get_reply_message(event, previous=True)
@@ -317,8 +336,9 @@ async def image_to_pdf(event: NewMessage.Event) -> None:
 
 async def ocrmypdf(event: NewMessage.Event) -> None:
     reply_message = await get_reply_message(event, previous=True)
-    status_message = await event.reply(t('starting_process'))
-    progress_message = await event.reply(t('performing_ocr'))
+    status_message, progress_message = await gather(
+        event.reply(t('starting_process')), event.reply(t('performing_ocr'))
+    )
     lang = 'ara'
     if matches := PDF.commands['pdf ocr'].pattern.search(reply_message.raw_text):
         lang = matches[-1] if len(matches.groups()) > 2 else lang
@@ -351,8 +371,9 @@ async def ocr_pdf(event: NewMessage.Event) -> None:
         return
 
     reply_message = await get_reply_message(event, previous=True)
-    status_message = await event.reply(t('starting_process'))
-    progress_message = await event.reply(t('performing_ocr_tahweel'))
+    status_message, progress_message = await gather(
+        event.reply(t('starting_process')), event.reply(t('performing_ocr_tahweel'))
+    )
     output_dir = Path(TMP_DIR / str(uuid4()))
     output_dir.mkdir(parents=True, exist_ok=True)
 
@@ -405,8 +426,9 @@ async def compress_pdf(event: NewMessage.Event | CallbackQuery.Event) -> None:
         option = ''
 
     reply_message = await get_reply_message(event, previous=True)
-    status_message = await event.reply(t('starting_process'))
-    progress_message = await event.reply(t('compressing_pdf'))
+    status_message, progress_message = await gather(
+        event.reply(t('starting_process')), event.reply(t('compressing_pdf'))
+    )
 
     with NamedTemporaryFile(dir=TMP_DIR, suffix='.pdf') as temp_file:
         temp_file_path = await download_file(event, temp_file, reply_message, progress_message)
@@ -480,20 +502,22 @@ async def crop_pdf_whitespace(event: NewMessage.Event) -> None:
     await progress_message.edit(t('pdf_whitespace_cropping_completed'))
 
 
-handlers: CommandHandlerDict = {
-    'pdf': image_to_pdf,
-    'pdf compress': compress_pdf,
-    'pdf crop': crop_pdf_whitespace,
-    'pdf extract': extract_pdf_pages,
-    'pdf images': convert_to_images,
-    'pdf merge': merge_pdf_initial,
-    'pdf ocr': ocrmypdf,
-    'pdf text': extract_pdf_text,
-    'pdf split': split_pdf,
-    'ocr': ocr_pdf,
-}
+handlers: CommandHandlerDict = MappingProxyType(
+    {
+        'pdf': image_to_pdf,
+        'pdf compress': compress_pdf,
+        'pdf crop': crop_pdf_whitespace,
+        'pdf extract': extract_pdf_pages,
+        'pdf images': convert_to_images,
+        'pdf merge': merge_pdf_initial,
+        'pdf ocr': ocrmypdf,
+        'pdf text': extract_pdf_text,
+        'pdf split': split_pdf,
+        'ocr': ocr_pdf,
+    }
+)
 
-handler = partial(dynamic_handler, handlers)
+handler = partial(dynamic_handler, get_pattern_handlers(handlers), get_callback_handlers(handlers))
 
 
 class PDF(ModuleBase):
@@ -584,27 +608,24 @@ class PDF(ModuleBase):
 
     @staticmethod
     def register_handlers(bot: TelegramClient) -> None:
+        bot.loop.create_task(sweep_merge_states(merge_states))
         bot.add_event_handler(
             merge_pdf_add,
-            NewMessage(
-                func=lambda e: (
-                    has_pdf_file(e, None)
-                    and merge_states[e.sender_id]['state'] == MergeState.COLLECTING
-                )
-            ),
+            NewMessage(func=lambda e: is_collecting(e, merge_states) and has_pdf_file(e, None)),
         )
         bot.add_event_handler(
             merge_pdf_process,
             CallbackQuery(
                 pattern=b'finish_pdf_merge',
-                func=lambda e: merge_states[e.sender_id]['state'] == MergeState.COLLECTING,
+                func=lambda e: is_collecting(e, merge_states),
             ),
         )
         bot.add_event_handler(
             split_pdf,
             NewMessage(
                 func=lambda e: (
-                    is_valid_reply_state(e, reply_states) and re.match(r'^(\d+)$', e.message.text)
+                    is_valid_reply_state(e, reply_states)
+                    and SPLIT_PAGES_COUNT_PATTERN.match(e.message.text)
                 )
             ),
         )
@@ -613,7 +634,7 @@ class PDF(ModuleBase):
             NewMessage(
                 func=lambda e: (
                     is_valid_reply_state(e, reply_states)
-                    and re.match(r'^[\d,\-\s]+$', e.message.text)
+                    and PAGE_NUMBERS_PATTERN.match(e.message.text)
                 )
             ),
         )
@@ -14,12 +14,15 @@ from src.utils.fast_telethon import download_file
 from src.utils.filters import has_file, is_valid_reply_state
 from src.utils.i18n import t
 from src.utils.progress import progress_callback
-from src.utils.reply import ReplyState, StateT, handle_callback_query_for_reply_state
+from src.utils.reply import (
+    ReplyState,
+    StateT,
+    UserReplyState,
+    handle_callback_query_for_reply_state,
+)
 from src.utils.telegram import get_reply_message
 
-reply_states: StateT = defaultdict(
-    lambda: {'state': ReplyState.WAITING, 'media_message_id': None, 'reply_message_id': None}
-)
+reply_states: StateT = defaultdict(UserReplyState)
 
 
 async def rename(event: NewMessage.Event | CallbackQuery.Event) -> None:
@@ -29,9 +32,9 @@ async def rename(event: NewMessage.Event | CallbackQuery.Event) -> None:
         )
 
     if event.sender_id in reply_states:
-        reply_states[event.sender_id]['state'] = ReplyState.PROCESSING
+        reply_states[event.sender_id].state = ReplyState.PROCESSING
         reply_message = await event.client.get_messages(
-            event.chat_id, ids=reply_states[event.sender_id]['media_message_id']
+            event.chat_id, ids=reply_states[event.sender_id].media_message_id
         )
         new_filename = event.message.text
     else:
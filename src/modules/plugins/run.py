@@ -1,4 +1,5 @@
-from asyncio import sleep
+from asyncio import gather, sleep
+from collections.abc import AsyncIterator
 from contextlib import suppress
 from datetime import UTC, datetime, timedelta
 from tempfile import NamedTemporaryFile
@@ -26,26 +27,41 @@ from src.utils.telegram import delete_message_after
 SECONDS_TO_WAIT = 5
 
 
+async def reply_with_progress(event: NewMessage.Event, status_text: str) -> tuple[Message, Message]:
+    """Send a command's status and process output messages in parallel."""
+    status_message, progress_message = await gather(
+        event.reply(status_text), event.reply(f'<pre>{t('process_output')}:</pre>')
+    )
+    return status_message, progress_message
+
+
 async def stream_shell_output(
     event: NewMessage.Event,
-    cmd: str,
+    cmd: str | list[str],
     status_message: Message | None = None,
     progress_message: Message | None = None,
+    *,
     shell: bool = True,
     max_length: int = MAX_MESSAGE_LENGTH,
-) -> str:
+    stdin: AsyncIterator[bytes] | None = None,
+) -> tuple[str, int | None]:
     if not status_message:
         status_message = await event.reply(t('starting_process'))
     if not progress_message:
         progress_message = await event.reply(f'<pre>{t('process_output')}:</pre>')
-    runner = run_subprocess_shell if shell else run_subprocess_exec
     timeout = ADMIN_TIMEOUT_SECONDS if event.sender_id in BOT_ADMINS else TIMEOUT_SECONDS
+    # argv lists are always executed directly, without a shell
+    output = (
+        run_subprocess_shell(cmd, timeout=timeout, stdin=stdin)
+        if shell and isinstance(cmd, str)
+        else run_subprocess_exec(cmd, timeout=timeout, stdin=stdin)
+    )
     buffer = ''
     code = None
     last_edit_time = datetime.now(UTC)
     edit_interval = timedelta(seconds=SECONDS_TO_WAIT)
 
-    async for full_log, return_code in runner(cmd, timeout=timeout):
+    async for full_log, return_code in output:
         buffer, code = full_log, return_code
         if bool(buffer.strip()):
             current_time = datetime.now(UTC)
@@ -102,15 +118,29 @@ async def stream_shell_output(
                 event.chat_id,
                 file=temp_file.name,
             )
-    return cast(str, status)
+    return cast(str, status), code
 
 
 async def run_shell(event: NewMessage.Event) -> None:
-    await stream_shell_output(event, event.message.text.replace('/shell ', '', 1), shell=True)  # noqa: S604
+    status_message, progress_message = await reply_with_progress(event, t('starting_process'))
+    await stream_shell_output(  # noqa: S604
+        event,
+        event.message.text.replace('/shell ', '', 1),
+        status_message,
+        progress_message,
+        shell=True,
+    )
 
 
 async def run_exec(event: NewMessage.Event) -> None:
-    await stream_shell_output(event, event.message.text.replace('/exec ', '', 1), shell=False)
+    status_message, progress_message = await reply_with_progress(event, t('starting_process'))
+    await stream_shell_output(
+        event,
+        event.message.text.replace('/exec ', '', 1),
+        status_message,
+        progress_message,
+        shell=False,
+    )
 
 
 class Shell(ModuleBase):
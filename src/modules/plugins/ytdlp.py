@@ -19,7 +19,7 @@ from src.utils.downloads import upload_file
 from src.utils.filters import has_valid_url
 from src.utils.i18n import t
 from src.utils.json import json_options, process_dict
-from src.utils.patterns import HTTP_URL_PATTERN, YOUTUBE_URL_PATTERN
+from src.utils.patterns import HTTP_URL_PATTERN, HTTP_URL_REGEX, YOUTUBE_URL_PATTERN
 from src.utils.progress import progress_callback
 from src.utils.subtitles import convert_subtitles
 from src.utils.telegram import edit_or_send_as_file, get_reply_message
@@ -102,7 +102,7 @@ async def get_info(event: NewMessage.Event | CallbackQuery.Event) -> None:
         if isinstance(event, CallbackQuery.Event)
         else event.message
     )
-    match = re.search(HTTP_URL_PATTERN, message.raw_text)
+    match = HTTP_URL_REGEX.search(message.raw_text)
     if not match:
         await progress_message.edit(t('no_valid_url_found'))
         return
@@ -140,7 +140,7 @@ async def get_subtitles(event: NewMessage.Event) -> None:
         if isinstance(event, CallbackQuery.Event)
         else event.message
     )
-    if match := re.search(HTTP_URL_PATTERN, message.raw_text):
+    if match := HTTP_URL_REGEX.search(message.raw_text):
         link = match.group(0)
     else:
         await progress_message.edit(t('no_valid_url_found'))
@@ -201,7 +201,7 @@ async def get_formats(event: NewMessage.Event | CallbackQuery.Event) -> None:
         if isinstance(event, CallbackQuery.Event)
         else event.message
     )
-    if match := re.search(HTTP_URL_PATTERN, message.raw_text):
+    if match := HTTP_URL_REGEX.search(message.raw_text):
         link = match.group(0)
     else:
         await progress_message.edit(t('no_valid_url_found'))
@@ -264,7 +264,7 @@ async def download_media(event: NewMessage.Event | CallbackQuery.Event) -> None:
         return
 
     reply_message = await get_reply_message(event, previous=True)
-    if match := re.search(HTTP_URL_PATTERN, reply_message.raw_text):
+    if match := HTTP_URL_REGEX.search(reply_message.raw_text):
         link = match.group(0)
     else:
         await event.edit(t('no_valid_url_found'))
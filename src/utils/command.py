@@ -1,3 +1,4 @@
+import re
 from collections.abc import Callable, Coroutine
 from dataclasses import dataclass
 from typing import Any
@@ -6,12 +7,17 @@ from regex.regex import Pattern
 from telethon.events import CallbackQuery, InlineQuery, NewMessage
 from telethon.tl.custom import Message
 
+from src.utils.i18n import LazyStr
+
+# commands may be matched with either the regex module or the stdlib re
+PatternT = Pattern | re.Pattern
+
 
 @dataclass
 class Command:
     handler: Callable[[NewMessage.Event | CallbackQuery.Event], Coroutine[Any, Any, None]]
     description: str
-    pattern: Pattern
+    pattern: PatternT
     condition: Callable[[NewMessage.Event, Message | None], bool] = lambda _, __: True
     name: str | None = None
     is_applicable_for_reply: bool = False
@@ -24,9 +30,10 @@ class Command:
 
 @dataclass
 class InlineCommand:
-    pattern: Pattern
+    # None means the command is matched by its key followed by any non-empty argument
+    pattern: PatternT | None = None
     handler: Callable[[InlineQuery.Event], Coroutine[Any, Any, None]] | None = None
-    name: str | None = None
+    name: str | LazyStr | None = None
 
     def __repr__(self) -> str:
         return (
@@ -1,3 +1,4 @@
+from collections.abc import AsyncGenerator
 from datetime import UTC, datetime
 from io import BufferedWriter
 from pathlib import Path
@@ -15,6 +16,12 @@ from src.utils.fast_telethon import upload_file as fast_upload_file
 from src.utils.i18n import t
 from src.utils.progress import progress_callback
 
+# Max MTProto part sizes: getFile accepts up to 1 MiB per request, saveFilePart up to 512 KiB.
+DOWNLOAD_PART_KB = 1024
+UPLOAD_PART_KB = 512
+# (file size upper bound, part size in KiB): small files are latency bound, big ones bandwidth bound
+PART_SIZE_TIERS = ((1024**2, 64), (50 * 1024**2, 256), (250 * 1024**2, 512))
+
 
 def get_default_filename() -> str:
     return f"{datetime.now(UTC).strftime('%Y-%m-%d_%H-%M-%S')}"
@@ -52,6 +59,11 @@ def get_download_name(message: Message, new_filename: str = '') -> Path:
     return new_filename_with_ext
 
 
+def get_part_size_kb(file_size: int, max_part_kb: int) -> int:
+    part_kb = next((kb for limit, kb in PART_SIZE_TIERS if file_size < limit), 1024)
+    return min(part_kb, max_part_kb)
+
+
 async def download_file(
     event: NewMessage.Event,
     temp_file: _TemporaryFileWrapper | BufferedWriter,
@@ -66,6 +78,7 @@ async def download_file(
             progress_callback=lambda current, total: progress_callback(
                 current, total, progress_message, t('downloading')
             ),
+            part_size_kb=get_part_size_kb(reply_message.document.size, DOWNLOAD_PART_KB),
         )
     else:
         await reply_message.download_media(
@@ -77,6 +90,16 @@ async def download_file(
     return Path(temp_file.name)
 
 
+async def iter_download_parts(
+    event: NewMessage.Event, reply_message: Message
+) -> AsyncGenerator[bytes, None]:
+    async for chunk in event.client.iter_download(
+        reply_message.media,
+        request_size=get_part_size_kb(reply_message.file.size, DOWNLOAD_PART_KB) * 1024,
+    ):
+        yield chunk
+
+
 async def upload_file(
     event: NewMessage.Event,
     output_file: Path,
@@ -94,6 +117,7 @@ async def upload_file(
             progress_callback=lambda current, total: progress_callback(
                 current, total, progress_message, t('uploading')
             ),
+            part_size_kb=get_part_size_kb(output_file.stat().st_size, UPLOAD_PART_KB),
         )
     await event.client.send_file(
         event.chat_id,
@@ -4,7 +4,7 @@
 import asyncio
 from collections import defaultdict
 from collections.abc import AsyncGenerator, Callable
-from contextlib import suppress
+from contextlib import aclosing, suppress
 from hashlib import md5
 from io import BufferedWriter
 from logging import Logger, getLogger
@@ -296,26 +296,40 @@ class ParallelTransferrer:
         part_count = ceil(file_size / part_size)
         await self._init_download(connection_count, file, part_count, part_size)  # type: ignore[arg-type]
 
-        part = 0
-        while part < part_count:
-            tasks = [self.loop.create_task(sender.next()) for sender in self.senders]  # type: ignore[call-arg, union-attr]
-            for task in tasks:
-                data = await task
+        # Part N is always fetched by sender N % connections. Instead of waiting for a whole round
+        # of senders before starting the next one, each sender gets its next request scheduled as
+        # soon as its previous part is taken, so one slow part no longer stalls all connections.
+        senders = cast(list[DownloadSender], self.senders)
+        tasks = [self.loop.create_task(sender.next()) for sender in senders]
+        try:
+            for part in range(part_count):
+                index = part % connection_count
+                data = await tasks[index]
                 if not data:
                     break
+                tasks[index] = self.loop.create_task(senders[index].next())
                 yield data
-                part += 1
-        await self._cleanup()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._cleanup()
 
 
 parallel_transfer_locks: defaultdict[int, asyncio.Lock] = defaultdict(lambda: asyncio.Lock())
 
 
-def stream_file(file_to_stream: BinaryIO, chunk_size: int = 1024) -> AsyncGenerator[bytes, None]:  # type: ignore[misc]
-    while True:
-        data_read = file_to_stream.read(chunk_size)
-        if not data_read:
-            break
+# number of downloaded parts that may wait in memory for the disk writer
+DOWNLOAD_QUEUE_SIZE = 8
+
+
+async def stream_file(
+    file_to_stream: BinaryIO, chunk_size: int = 1024
+) -> AsyncGenerator[bytes, None]:
+    # read the next chunk in a worker thread while the current one is being uploaded
+    next_read = asyncio.ensure_future(asyncio.to_thread(file_to_stream.read, chunk_size))
+    while data_read := await next_read:
+        next_read = asyncio.ensure_future(asyncio.to_thread(file_to_stream.read, chunk_size))
         yield data_read
 
 
@@ -324,17 +338,20 @@ async def _internal_transfer_to_telegram(
     response: BinaryIO,
     filename: str,
     progress_callback: Callable,
+    part_size_kb: float | None = None,
 ) -> tuple[TypeInputFile, int]:
     file_id = generate_random_long()
     file_size = Path(response.name).stat().st_size
     hash_md5 = md5(usedforsecurity=False)
     uploader = ParallelTransferrer(client)
-    part_size, part_count, is_large = await uploader.init_upload(file_id, file_size)
+    part_size, part_count, is_large = await uploader.init_upload(file_id, file_size, part_size_kb)
     buffer = bytearray()
-    for data in stream_file(response):  # type: ignore[attr-defined]
+    read_size = 0
+    async for data in stream_file(response, part_size):
+        read_size += len(data)
         if progress_callback:  # type: ignore[truthy-function]
             with suppress(BaseException):
-                await _maybe_await(progress_callback(response.tell(), file_size))
+                await _maybe_await(progress_callback(read_size, file_size))
         if not is_large:
             hash_md5.update(data)
         if len(buffer) == 0 and len(data) == part_size:
@@ -362,17 +379,36 @@ async def download_file(
     location: TypeLocation,
     out: _TemporaryFileWrapper | BinaryIO | BufferedWriter,
     progress_callback: Optional[Callable] = None,  # noqa: UP007
+    part_size_kb: float | None = None,
 ) -> BinaryIO:
     size = location.size
     dc_id, location = get_input_location(location)
     # We lock the transfers because telegram has connection count limits
     downloader = ParallelTransferrer(client, dc_id)
-    downloaded = downloader.download(location, size)
-    async for x in downloaded:
-        out.write(x)
-        if progress_callback:
-            with suppress(BaseException):
-                await _maybe_await(progress_callback(out.tell(), size))
+    # Decouple fetching from writing so a disk stall doesn't stop the connections from receiving.
+    queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=DOWNLOAD_QUEUE_SIZE)
+
+    async def fetch_parts() -> None:
+        try:
+            async with aclosing(downloader.download(location, size, part_size_kb)) as downloaded:
+                async for x in downloaded:
+                    await queue.put(x)
+        finally:
+            # wake the writer up on completion or failure, it's gone already if we got cancelled
+            if not asyncio.current_task().cancelling():  # type: ignore[union-attr]
+                await queue.put(None)
+
+    fetcher = client.loop.create_task(fetch_parts())
+    try:
+        while (x := await queue.get()) is not None:
+            # the write may block on disk, keep it off the event loop
+            await asyncio.to_thread(out.write, x)
+            if progress_callback:
+                with suppress(BaseException):
+                    await _maybe_await(progress_callback(out.tell(), size))
+        await fetcher
+    finally:
+        fetcher.cancel()
     return out  # type: ignore[return-value]
 
 
@@ -381,7 +417,14 @@ async def upload_file(
     file: _TemporaryFileWrapper | BinaryIO,
     filename: str,
     progress_callback: Optional[Callable] = None,  # noqa: UP007
+    part_size_kb: float | None = None,
 ) -> TypeInputFile:
     return (
-        await _internal_transfer_to_telegram(client, file, filename, progress_callback)  # type: ignore[arg-type]
+        await _internal_transfer_to_telegram(
+            client,
+            file,  # type: ignore[arg-type]
+            filename,
+            progress_callback,  # type: ignore[arg-type]
+            part_size_kb,
+        )
     )[0]
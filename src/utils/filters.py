@@ -1,5 +1,7 @@
+from collections.abc import Callable
+
 import regex as re
-from telethon.events import NewMessage
+from telethon.events import CallbackQuery, NewMessage
 from telethon.tl.custom import Message
 from telethon.tl.types import (
     DocumentAttributeAnimated,
@@ -11,8 +13,8 @@ from telethon.tl.types import (
 )
 
 from src import BOT_ADMINS
-from src.utils.patterns import HTTP_URL_PATTERN
-from src.utils.reply import ReplyState, StateT
+from src.utils.patterns import HTTP_URL_REGEX
+from src.utils.reply import MergeState, MergeStateT, ReplyState, StateT
 
 
 def is_admin_in_private(event: NewMessage.Event, _: Message) -> bool:
@@ -99,15 +101,64 @@ def has_media(event: NewMessage.Event, reply_message: Message | None, **media_ty
     return all(checks)
 
 
+def make_media_condition(
+    **media_types: bool,
+) -> Callable[[NewMessage.Event, Message | None], bool]:
+    """
+    Build a command condition that behaves like `has_media` with the given media types.
+
+    The media types are parsed once here, so checking a message only looks up its media attributes.
+    """
+    # (media attributes of which any is present, attribute that must be absent, expected result)
+    checks: list[tuple[tuple[str, ...], str | None, bool]] = []
+    for media_type, should_have in media_types.items():
+        if media_type == 'any':
+            checks.append((tuple(all_media_types), None, should_have))
+        elif media_type.startswith('not_'):
+            actual_type = media_type[4:]
+            other_types = tuple(t for t in all_media_types if t != actual_type)
+            checks.append((other_types, actual_type, should_have))
+        else:
+            checks.append((tuple(media_type.split('_or_')), None, should_have))
+
+    def condition(event: NewMessage.Event, reply_message: Message | None) -> bool:
+        if not checks:
+            return True
+        message = reply_message or event.message
+        if not message.file:
+            return False
+        return all(
+            (absent is None or not getattr(message, absent, None))
+            and any(getattr(message, attribute, None) for attribute in attributes) == expected
+            for attributes, absent, expected in checks
+        )
+
+    return condition
+
+
+has_audio = make_media_condition(audio=True)
+has_no_audio = make_media_condition(not_audio=True)
+has_audio_or_voice = make_media_condition(audio_or_voice=True)
+has_any_media = make_media_condition(any=True)
+has_video = make_media_condition(video=True)
+has_video_or_video_note = make_media_condition(video_or_video_note=True)
+has_no_voice = make_media_condition(not_voice=True)
+
+
 def is_valid_reply_state(event: NewMessage.Event, reply_states: StateT) -> bool:
     return (
         event.is_reply
         and event.sender_id in reply_states
-        and reply_states[event.sender_id]['state'] == ReplyState.WAITING
-        and event.message.reply_to_msg_id == reply_states[event.sender_id]['reply_message_id']
+        and reply_states[event.sender_id].state == ReplyState.WAITING
+        and event.message.reply_to_msg_id == reply_states[event.sender_id].reply_message_id
     )
 
 
+def is_collecting(event: NewMessage.Event | CallbackQuery.Event, states: MergeStateT) -> bool:
+    user_state = states.get(event.sender_id)
+    return user_state is not None and user_state.state is MergeState.COLLECTING
+
+
 def is_file(event: NewMessage.Event, reply_message: Message | None) -> bool:
     """
     Check if the message or its reply contains an attachment uploaded as a file.
@@ -133,10 +184,10 @@ def is_file(event: NewMessage.Event, reply_message: Message | None) -> bool:
 
 
 def has_valid_url(
-    event: NewMessage.Event, reply_message: Message | None, pattern: str = HTTP_URL_PATTERN
+    event: NewMessage.Event, reply_message: Message | None, pattern: re.Pattern = HTTP_URL_REGEX
 ) -> bool:
     message = reply_message or event.message
-    return bool(re.search(pattern, message.raw_text))
+    return bool(pattern.search(message.raw_text))
 
 
 def has_file_with_ext(
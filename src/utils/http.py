@@ -1,18 +1,75 @@
+import asyncio
 import logging
+from collections import defaultdict
+from time import monotonic
 from typing import Any
 
-from aiohttp import ClientResponse, ClientSession
+import orjson
+from aiohttp import ClientResponse, ClientSession, TCPConnector
+
+_session: ClientSession | None = None
+
+
+def get_session() -> ClientSession:
+    """Return a shared session so connections (DNS, TCP and TLS) are reused between requests."""
+    global _session  # noqa: PLW0603
+    if _session is None or _session.closed:
+        _session = ClientSession(
+            connector=TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+        )
+    return _session
+
+
+async def close_session() -> None:
+    if _session is not None and not _session.closed:
+        await _session.close()
 
 
 async def fetch_json(url: str, params: dict | None = None) -> Any:
-    async with ClientSession() as session:
-        try:
-            response: ClientResponse
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    return await response.json()
-                logging.error(f'HTTP error: {response.status} for URL: {url}')
-                return None
-        except Exception as e:  # noqa: BLE001
-            logging.error(f'Error fetching data from {url}: {e}')
+    try:
+        response: ClientResponse
+        async with get_session().get(url, params=params) as response:
+            if response.status == 200:
+                return orjson.loads(await response.read())
+            logging.error(f'HTTP error: {response.status} for URL: {url}')
             return None
+    except Exception as e:  # noqa: BLE001
+        logging.error(f'Error fetching data from {url}: {e}')
+        return None
+
+
+CACHE_MAX_SIZE = 1024
+CacheKeyT = tuple[str, tuple[tuple[str, Any], ...]]
+_cache: dict[CacheKeyT, tuple[float, Any]] = {}
+_cache_locks: defaultdict[CacheKeyT, asyncio.Lock] = defaultdict(asyncio.Lock)
+_cache_waiters: defaultdict[CacheKeyT, int] = defaultdict(int)
+
+
+def _evict_cache() -> None:
+    now = monotonic()
+    for key in [key for key, (expires_at, _) in _cache.items() if expires_at <= now]:
+        del _cache[key]
+    while len(_cache) >= CACHE_MAX_SIZE:
+        del _cache[next(iter(_cache))]
+
+
+async def cached_fetch_json(url: str, params: dict | None = None, ttl: float = 60) -> Any:
+    """fetch_json with an in-memory TTL cache, concurrent identical requests share one fetch."""
+    key = (url, tuple(sorted((params or {}).items())))
+    _cache_waiters[key] += 1
+    try:
+        async with _cache_locks[key]:
+            if (cached := _cache.get(key)) and cached[0] > monotonic():
+                return cached[1]
+            data = await fetch_json(url, params)
+            if data is not None:
+                if len(_cache) >= CACHE_MAX_SIZE:
+                    _evict_cache()
+                _cache[key] = (monotonic() + ttl, data)
+            return data
+    finally:
+        # locks are only needed while requests for the key are in flight
+        _cache_waiters[key] -= 1
+        if not _cache_waiters[key]:
+            del _cache_waiters[key]
+            del _cache_locks[key]
@@ -25,6 +25,28 @@ def get_translator(language_code: str) -> Any:
 
 t = get_translator(getenv('BOT_LANGUAGE', 'en_US'))
 
+
+class LazyStr:
+    """Translation that is only looked up when it's first rendered."""
+
+    __slots__ = ('_key', '_value')
+
+    def __init__(self, key: str) -> None:
+        self._key = key
+        self._value: str | None = None
+
+    def __str__(self) -> str:
+        if self._value is None:
+            self._value = t(self._key)
+        return self._value
+
+    def __format__(self, format_spec: str) -> str:
+        return format(str(self), format_spec)
+
+    def __repr__(self) -> str:
+        return f'LazyStr({self._key!r})'
+
+
 #
 # def localize(function: F) -> F:
 #     @wraps(function)
@@ -25,3 +25,10 @@ def process_dict(obj: Any) -> Any:
     if isinstance(obj, bytes):
         return '<bytes>'
     return obj
+
+
+def bytes_default(obj: Any) -> str:
+    """orjson ``default`` hook that replaces raw bytes with a placeholder."""
+    if isinstance(obj, bytes):
+        return '<bytes>'
+    raise TypeError
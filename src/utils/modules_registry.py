@@ -8,6 +8,7 @@ from typing import cast
 
 from orjson import orjson
 from telethon.events import NewMessage
+from telethon.tl.types import BotCommand
 
 from src.modules.base import ModuleBase
 from src.utils.permission_manager import PermissionManager
@@ -58,6 +59,7 @@ class ModuleRegistry:
         self.permission_manager = permission_manager
         self.modules_file = Path(directory).parent / 'modules.json'
         self.modules_status: dict[str, bool] = self._load_modules_status()
+        self._bot_commands_cache: dict[tuple[str, ...], list[BotCommand]] = {}
 
     def _load_modules_status(self) -> dict[str, bool]:
         if self.modules_file.exists():
@@ -72,10 +74,12 @@ class ModuleRegistry:
     def enable_module(self, module_name: str) -> None:
         self.modules_status[module_name] = True
         self._save_modules_status()
+        self._bot_commands_cache.clear()
 
     def disable_module(self, module_name: str) -> None:
         self.modules_status[module_name] = False
         self._save_modules_status()
+        self._bot_commands_cache.clear()
 
     def is_module_enabled(self, module_name: str) -> bool:
         return self.modules_status.get(module_name, True)
@@ -103,6 +107,18 @@ class ModuleRegistry:
             and self.permission_manager.has_permission(module.name, event.chat_id)
         }
 
+    def get_bot_commands(self, all_commands: dict[str, ModuleBase.CommandsT]) -> list[BotCommand]:
+        """Return top-level commands as BotCommand objects, cached per set of visible modules."""
+        key = tuple(all_commands)
+        if (bot_commands := self._bot_commands_cache.get(key)) is None:
+            bot_commands = self._bot_commands_cache[key] = [
+                BotCommand(command_name, command_data.description)
+                for module_commands in all_commands.values()
+                for command_name, command_data in module_commands.items()
+                if ' ' not in command_name
+            ]
+        return bot_commands
+
     async def get_applicable_commands(self, event: NewMessage.Event) -> list[str]:
         return [
             command
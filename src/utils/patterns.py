@@ -1,3 +1,5 @@
+import regex as re
+
 YOUTUBE_URL_PATTERN = (
     r'(?:https?:\/\/)?(?:www\.)?(?:youtube\.com|youtu\.be)'
     r'\/(?:watch\?v=)?(?:embed\/)?(?:v\/)?(?:shorts\/)?(?:live\/)?'
@@ -7,3 +9,4 @@ HTTP_URL_PATTERN = (
     r'https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}'
     r'\b([-a-zA-Z0-9()@:%_\+.~#?&//=]*)'
 )
+HTTP_URL_REGEX = re.compile(HTTP_URL_PATTERN)
@@ -1,6 +1,8 @@
+import asyncio
 from collections import defaultdict
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Any
+from time import monotonic
 
 from telethon.events import CallbackQuery
 
@@ -16,7 +18,26 @@ class MergeState(Enum):
     MERGING = auto()
 
 
-StateT = defaultdict[int, dict[str, Any]]
+@dataclass(slots=True)
+class UserReplyState:
+    state: ReplyState = ReplyState.WAITING
+    media_message_id: int | None = None
+    reply_message_id: int | None = None
+
+
+MERGE_STATE_TTL_SECONDS = 60 * 60  # drop merge sessions that are still collecting after an hour
+SWEEP_INTERVAL_SECONDS = 5 * 60
+
+
+@dataclass(slots=True)
+class UserMergeState:
+    state: MergeState = MergeState.IDLE
+    files: list[int] = field(default_factory=list)
+    started_at: float = field(default_factory=monotonic)
+
+
+StateT = defaultdict[int, UserReplyState]
+MergeStateT = dict[int, UserMergeState]
 
 
 async def handle_callback_query_for_reply_state(
@@ -24,6 +45,20 @@ async def handle_callback_query_for_reply_state(
 ) -> None:
     await event.answer()
     bot_reply = await event.reply(reply_text, reply_to=event.message_id)
-    reply_states[event.sender_id]['state'] = ReplyState.WAITING
-    reply_states[event.sender_id]['reply_message_id'] = bot_reply.id
-    reply_states[event.sender_id]['media_message_id'] = (await event.get_message()).reply_to_msg_id
+    reply_states[event.sender_id] = UserReplyState(
+        reply_message_id=bot_reply.id,
+        media_message_id=(await event.get_message()).reply_to_msg_id,
+    )
+
+
+async def sweep_merge_states(*states: MergeStateT) -> None:
+    """Periodically drop idle and abandoned merge sessions, keeping the ones being merged."""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+        expired = monotonic() - MERGE_STATE_TTL_SECONDS
+        for user_states in states:
+            for sender_id, user_state in list(user_states.items()):
+                if user_state.state is MergeState.IDLE or (
+                    user_state.state is MergeState.COLLECTING and user_state.started_at < expired
+                ):
+                    del user_states[sender_id]
@@ -1,7 +1,7 @@
 import asyncio
 import logging
-from asyncio.subprocess import PIPE, Process
-from collections.abc import AsyncGenerator
+from asyncio.subprocess import DEVNULL, PIPE, Process
+from collections.abc import AsyncGenerator, AsyncIterator
 from os import getpgid, killpg, setsid
 from shlex import split as shlex_split
 from signal import SIGKILL
@@ -27,11 +27,40 @@ async def read_stream(stream: asyncio.StreamReader | None) -> AsyncGenerator[str
         yield f'{_line.decode().strip()}\n'
 
 
+async def feed_stdin(process: Process, chunks: AsyncIterator[bytes]) -> None:
+    if process.stdin is None:
+        return
+    try:
+        async for chunk in chunks:
+            process.stdin.write(chunk)
+            await process.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # Process exited before consuming all of its input
+    finally:
+        process.stdin.close()
+
+
+async def wait_for_stdin(stdin_task: asyncio.Task | None, cmd: str | list[str]) -> str:
+    """Wait until the input is fed to the process, returning an error note if it failed."""
+    if stdin_task is None:
+        return ''
+    try:
+        await stdin_task
+    except Exception as err:  # noqa: BLE001
+        logger.error(f'Error while feeding input to command: {cmd}')
+        return f'\n{t('an_error_occurred', error=err)}\n'
+    return ''
+
+
 async def run_subprocess_shell(
-    cmd: str, timeout: int = TIMEOUT_SECONDS, **kwargs: Any
+    cmd: str,
+    timeout: int = TIMEOUT_SECONDS,
+    stdin: AsyncIterator[bytes] | None = None,
+    **kwargs: Any,
 ) -> AsyncGenerator[tuple[str, int | None], None]:
     process: Process = await asyncio.create_subprocess_shell(  # noqa: S604
         cmd,
+        stdin=PIPE if stdin else None,
         stdout=PIPE,
         stderr=PIPE,
         shell=True,
@@ -39,27 +68,40 @@ async def run_subprocess_shell(
         cwd=kwargs.pop('cwd', TMP_DIR),
         **kwargs,
     )
-    async for line, code in _run_subprocess(process, cmd, timeout=timeout):
+    async for line, code in _run_subprocess(process, cmd, timeout=timeout, stdin=stdin):
         yield line, code
 
 
 async def run_subprocess_exec(
-    cmd: str, timeout: int = TIMEOUT_SECONDS, **kwargs: Any
+    cmd: str | list[str],
+    timeout: int = TIMEOUT_SECONDS,
+    stdin: AsyncIterator[bytes] | None = None,
+    **kwargs: Any,
 ) -> AsyncGenerator[tuple[str, int | None], None]:
-    args = shlex_split(cmd)
+    args = shlex_split(cmd) if isinstance(cmd, str) else cmd
     process: Process = await asyncio.create_subprocess_exec(
-        *args, stdout=PIPE, stderr=PIPE, preexec_fn=setsid, cwd=kwargs.pop('cwd', TMP_DIR), **kwargs
+        *args,
+        stdin=PIPE if stdin else None,
+        stdout=PIPE,
+        stderr=PIPE,
+        preexec_fn=setsid,
+        cwd=kwargs.pop('cwd', TMP_DIR),
+        **kwargs,
     )
-    async for line, code in _run_subprocess(process, cmd, timeout=timeout):
+    async for line, code in _run_subprocess(process, cmd, timeout=timeout, stdin=stdin):
         yield line, code
 
 
 async def _run_subprocess(  # noqa: C901, PLR0912
-    process: Process, cmd: str, timeout: int = TIMEOUT_SECONDS
+    process: Process,
+    cmd: str | list[str],
+    timeout: int = TIMEOUT_SECONDS,
+    stdin: AsyncIterator[bytes] | None = None,
 ) -> AsyncGenerator[tuple[str, int | None], None]:
     output = ''
     return_code = None
     process_task = asyncio.create_task(process.wait(), name='process')
+    stdin_task = asyncio.create_task(feed_stdin(process, stdin)) if stdin else None
     stdout_reader = read_stream(process.stdout)
     stderr_reader = read_stream(process.stderr)
 
@@ -95,6 +137,11 @@ async def _run_subprocess(  # noqa: C901, PLR0912
             if not done:  # Timeout occurred
                 raise TimeoutError
 
+        if stdin_error := await wait_for_stdin(stdin_task, cmd):
+            # The input was cut short, so whatever the process wrote is incomplete
+            output += stdin_error
+            return_code = -1
+
     except StopAsyncIteration:
         pass
 
@@ -109,8 +156,8 @@ async def _run_subprocess(  # noqa: C901, PLR0912
         yield output, None
 
     finally:
-        for task in [*list(pending.values()), process_task]:
-            if not task.done():
+        for task in [*list(pending.values()), process_task, stdin_task]:
+            if task and not task.done():
                 task.cancel()
         if process.returncode is None:
             try:
@@ -124,9 +171,9 @@ async def _run_subprocess(  # noqa: C901, PLR0912
 
 
 async def run_command(
-    command: str, timeout: int = TIMEOUT_SECONDS, **kwargs: Any
+    command: str | list[str], timeout: int = TIMEOUT_SECONDS, **kwargs: Any
 ) -> tuple[str, int]:
-    args = shlex_split(command)
+    args = shlex_split(command) if isinstance(command, str) else command
     process = await asyncio.create_subprocess_exec(
         *args, stdout=PIPE, stderr=PIPE, cwd=kwargs.pop('cwd', TMP_DIR), **kwargs
     )
@@ -136,3 +183,18 @@ async def run_command(
         return t('process_timed_out'), -1
     output = (stdout + stderr).decode('utf-8').strip()
     return output, (process.returncode or 0)
+
+
+async def run_command_bytes(
+    command: str | list[str], timeout: int = TIMEOUT_SECONDS, **kwargs: Any
+) -> tuple[bytes, int]:
+    """Like `run_command`, but return the raw stdout only, for output that is parsed, not shown."""
+    args = shlex_split(command) if isinstance(command, str) else command
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=PIPE, stderr=DEVNULL, cwd=kwargs.pop('cwd', TMP_DIR), **kwargs
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=timeout)
+    except TimeoutError:
+        return b'', -1
+    return stdout, (process.returncode or 0)
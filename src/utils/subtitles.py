@@ -5,6 +5,8 @@ import regex as re
 
 from src.utils.run import run_command
 
+SUBTITLE_INDEX_PATTERN = re.compile(r'^\d+$')
+
 
 def srt_to_txt(srt_file: Path, txt_file: Path | None = None) -> Path:
     """
@@ -20,7 +22,7 @@ def srt_to_txt(srt_file: Path, txt_file: Path | None = None) -> Path:
     text_lines = OrderedDict.fromkeys(
         line.strip()
         for line in srt_file.read_text('utf-8').splitlines()
-        if line.strip() and not re.match(r'^\d+$', line) and '-->' not in line
+        if line.strip() and not SUBTITLE_INDEX_PATTERN.match(line) and '-->' not in line
     )
     if not txt_file:
         txt_file = Path(srt_file).with_suffix('.txt')